@@ -19,6 +19,8 @@ python -m pip install pyinstaller pillow
 # - onefile creates a single self-contained binary
 # - windowed removes the terminal window for GUI apps
 # - you can add an icon by uncommenting --icon
+# - optimize 2 bundles -OO bytecode (no docstrings/asserts), so nothing is compiled at launch
+# - the Node render helper and icons are looked up next to the script, so ship them alongside
 pyinstaller \
   --noconfirm \
   --onefile \
@@ -26,7 +28,10 @@ pyinstaller \
   --name "${APP_NAME}" \
   --clean \
   --specpath build \
-  mermaid_studio.spec
+  --optimize 2 \
+  --add-data "$(pwd)/mmdc_server.mjs:." \
+  --add-data "$(pwd)/assets:assets" \
+  "${ENTRYPOINT}"
 
 echo
 echo "Build finished."
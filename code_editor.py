@@ -7,6 +7,7 @@
 #       .focus_editor() -> None
 #       .on_change(callback) -> None            # called after user edits pause
 #       .set_theme(theme_dict) -> None          # optional color overrides
+#       .edit_version -> int                    # bumped on every buffer change
 #
 # Usage example in your main file:
 #   from code_editor import MermaidEditor
@@ -17,12 +18,15 @@
 
 from __future__ import annotations
 import re
+from bisect import bisect_right
+from collections import defaultdict
 import tkinter as tk
 from tkinter import ttk
+from types import MappingProxyType
 from typing import Callable, Optional
 
-# Default light theme
-DEFAULT_THEME = {
+# Default light theme (read-only; each editor gets its own merged copy)
+DEFAULT_THEME = MappingProxyType({
     "bg": "#ffffff",
     "fg": "#1e1e1e",
     "gutter_bg": "#f3f3f3",
@@ -42,69 +46,157 @@ DEFAULT_THEME = {
     "error": "#ff0000",
     "current_line": "#f7faff",
     "match_bg": "#fff2a8",
-}
-
-MERMAID_KEYWORDS = r"\b(graph|flowchart|flowchart-(LR|RL|TB|BT)|sequenceDiagram|classDiagram|stateDiagram|stateDiagram-v2|erDiagram|gantt|journey|pie|mindmap|timeline|gitGraph|architecture-beta|quadrantChart|radar|radar-beta|sankey|sankey-beta|treemap|treemap-beta|C4Context|zenuml)\b"
-MERMAID_TYPES = r"\b(subgraph|end|click|style|linkStyle|accTitle|accDescr|activate|deactivate|autonumber|dateFormat|axisFormat|section|participant|Note|classDef|direction|title|loop|alt|opt|par|rect|else)\b"
+})
+
+# Words are matched as identifiers and classified by case-insensitive set lookup
+MERMAID_KEYWORDS = frozenset(w.casefold() for w in (
+    "graph flowchart flowchart-LR flowchart-RL flowchart-TB flowchart-BT sequenceDiagram "
+    "classDiagram stateDiagram stateDiagram-v2 erDiagram gantt journey pie mindmap timeline "
+    "gitGraph architecture-beta quadrantChart radar radar-beta sankey sankey-beta treemap "
+    "treemap-beta C4Context zenuml"
+).split())
+MERMAID_TYPES = frozenset(w.casefold() for w in (
+    "subgraph end click style linkStyle accTitle accDescr activate deactivate autonumber "
+    "dateFormat axisFormat section participant Note classDef direction title loop alt opt "
+    "par rect else"
+).split())
 
 # Arrows and edge operators commonly used in Mermaid
-ARROWS = r"(-->|==>|===|->|<-|<->|--x|x--|--o|o--|--\||\|--|==|--|\.\.|:::)"
+ARROWS = r"(?:-->|==>|===|->|<-|<->|--x|x--|--o|o--|--\||\|--|==|--|\.\.|:::)"
 # Node-like delimiters for highlighting labels quickly: [label], (label), ((label)), {label}, [[label]]
-NODE_DELIMS = r"(\[\[.*?\]\]|\[.*?\]|\(\(.*?\)\)|\([^()\n]*\)|\{[^{}\n]*\})"
+NODE_DELIMS = r"(?:\[\[.*?\]\]|\[.*?\]|\(\(.*?\)\)|\([^()\n]*\)|\{[^{}\n]*\})"
 
-# Simple token patterns
+# Simple token patterns, in match priority order (first alternative wins at a given position).
+# Flags are scoped inline so all patterns can share one compiled regex.
 TOKENS = [
-    ("comment", re.compile(r"%%.*?$", re.MULTILINE)),
-    ("directive", re.compile(r"%%\{.*?}%%", re.DOTALL)),
-    ("keyword", re.compile(MERMAID_KEYWORDS, re.IGNORECASE)),
-    ("type", re.compile(MERMAID_TYPES, re.IGNORECASE)),
-    ("string", re.compile(r"(?P<q>['\"]).*?(?P=q)")),
-    ("number", re.compile(r"\b\d+(?:\.\d+)?\b")),
-    ("arrow", re.compile(ARROWS)),
-    ("node", re.compile(NODE_DELIMS)),
-    ("operator", re.compile(r"[:=+/*<>!|.,]")),
+    ("directive", r"(?s:%%\{.*?}%%)"),
+    ("comment", r"%%[^\n]*"),
+    ("string", r'"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\''),
+    # Hyphens only inside a word, so "A-->B" still yields an arrow
+    ("ident", r"[A-Za-z][A-Za-z0-9_]*(?:-[A-Za-z0-9_]+)*"),
+    ("number", r"\b\d+(?:\.\d+)?\b"),
+    ("arrow", ARROWS),
+    ("node", NODE_DELIMS),
+    ("operator", r"[:=+/*<>!|.,]"),
 ]
+# Tags applied by the highlighter; "ident" becomes "keyword" or "type" (or nothing)
+TOKEN_TAGS = ("directive", "comment", "keyword", "type", "string",
+              "number", "arrow", "node", "operator")
+
+# One pass over the text; m.lastgroup names the matching token tag
+_MASTER_RE = re.compile("|".join(f"(?P<{tag}>{src})" for tag, src in TOKENS))
+_NEWLINE_RE = re.compile(r"\n")
+# A newline, or an unescaped single or double quote
+_QUOTE_OR_NL_RE = re.compile(r"\n|(?<!\\)['\"]")
+# Max characters scanned in either direction when looking for a matching bracket
+_BRACKET_SCAN_LIMIT = 100_000
+# Max characters of visible text scanned per highlight pass
+_HIGHLIGHT_CHAR_LIMIT = 200_000
+_OPEN_TO_CLOSE = {"(": ")", "[": "]", "{": "}"}
+_CLOSE_TO_OPEN = {")": "(", "]": "[", "}": "{"}
+# Indentation and comment prefixes used by the editing key bindings
+_LEADING_WS_RE = re.compile(r"[ \t]*")
+_LEADING_COMMENT_RE = re.compile(r"[ \t]*%%[ ]?")
+
+def _changed_lines(old: list[str], new: list[str]) -> tuple[int, int]:
+    """Return the [lo, hi) range of lines in `new` that differ from `old`,
+    skipping the common leading and trailing lines."""
+    limit = min(len(old), len(new))
+    lo = 0
+    while lo < limit and old[lo] == new[lo]:
+        lo += 1
+    tail = 0
+    while tail < limit - lo and old[-1 - tail] == new[-1 - tail]:
+        tail += 1
+    return lo, len(new) - tail
+
+def _line_of(index: str) -> int:
+    """Line number of a Tk "line.col" index string."""
+    return int(index.split(".", 1)[0])
 
 class LineNumbers(tk.Canvas):
     def __init__(self, master, text_widget: tk.Text, theme: dict):
         super().__init__(master, width=48, highlightthickness=0, bg=theme["gutter_bg"])
         self.text_widget = text_widget
         self.theme = theme
-        self.text_widget.bind("<<Change>>", self._on_change, add=True)
+        self._items: list[int] = []      # canvas text items, one per visible line
+        self._last_state = None
+        self._redraw_scheduled = False
+        # Edits and scrolling (wheel, keyboard, see()) are forwarded by MermaidEditor
         self.text_widget.bind("<Configure>", self._on_change, add=True)
-        self.text_widget.bind("<MouseWheel>", self._on_change, add=True)           # Windows
-        self.text_widget.bind("<Button-4>", self._on_change, add=True)             # Linux scroll up
-        self.text_widget.bind("<Button-5>", self._on_change, add=True)             # Linux scroll down
 
     def _on_change(self, event=None):
+        self.schedule_redraw()
+
+    def schedule_redraw(self):
+        # Coalesce bursts of edits/scroll ticks into one repaint
+        if not self._redraw_scheduled:
+            self._redraw_scheduled = True
+            self.after(40, self._do_redraw)
+
+    def _do_redraw(self):
+        self._redraw_scheduled = False
         self.redraw()
 
     def redraw(self):
-        self.delete("all")
-        i = self.text_widget.index("@0,0")
-        last_index = self.text_widget.index("end-1c")
+        tw = self.text_widget
+        i = tw.index("@0,0")
+        last_index = tw.index("end-1c")
+
+        # Skip the repaint if the visible lines, their position, the line count
+        # and the color are all the same as last time
+        top = tw.dlineinfo(i)
+        state = (
+            i,
+            tw.index(f"@0,{tw.winfo_height()}"),
+            last_index.split(".")[0],
+            last_index.endswith(".0"),    # an empty last line is not numbered
+            top[1] if top else None,
+            self.theme["gutter_fg"],
+        )
+        if state == self._last_state:
+            return
+        self._last_state = state
+
+        # Reuse existing text items, creating or deleting only the difference
+        used = 0
         while True:
-            dline = self.text_widget.dlineinfo(i)
+            dline = tw.dlineinfo(i)
             if dline is None:
                 break
             y = dline[1]
             line_no = str(i).split(".")[0]
-            self.create_text(44, y, anchor="ne", text=line_no, font=("Courier New", 11),
-                             fill=self.theme["gutter_fg"])
-            i = self.text_widget.index(f"{i}+1line")
-            if self.text_widget.compare(i, ">=", last_index):
+            if used < len(self._items):
+                item = self._items[used]
+                self.coords(item, 44, y)
+                self.itemconfigure(item, text=line_no, fill=self.theme["gutter_fg"])
+            else:
+                self._items.append(self.create_text(44, y, anchor="ne", text=line_no,
+                                                    font=("Courier New", 11),
+                                                    fill=self.theme["gutter_fg"]))
+            used += 1
+            i = tw.index(f"{i}+1line")
+            if tw.compare(i, ">=", last_index):
                 break
+        for item in self._items[used:]:
+            self.delete(item)
+        del self._items[used:]
+
 
 class MermaidEditor(tk.Frame):
     def __init__(self, master, theme: Optional[dict] = None):
         super().__init__(master)
-        self.theme = dict(DEFAULT_THEME)
-        if theme:
-            self.theme.update(theme)
+        self.theme = {**DEFAULT_THEME, **(theme or {})}
 
         self._change_callback: Optional[Callable[[], None]] = None
         self._highlight_scheduled = False
         self._change_scheduled = False
+        self._last_highlight_key: Optional[tuple[int, int, str]] = None
+        self._current_line_ln: Optional[int] = None
+        self._match_tagged = False
+        self.edit_version = 0
+        self._text_cache = ""
+        self._text_cache_version = -1
 
         self._build_ui()
         self._configure_tags()
@@ -115,11 +207,24 @@ class MermaidEditor(tk.Frame):
 
     # Public API
     def get(self) -> str:
-        return self.text.get("1.0", "end-1c")
+        # Reuse the last copy while the buffer is unchanged. Tk sets the modified
+        # flag synchronously, so it also covers edits whose <<Modified>> is still queued.
+        if self._text_cache_version == self.edit_version and not self.text.edit_modified():
+            return self._text_cache
+        self._text_cache = self.text.get("1.0", "end-1c")
+        self._text_cache_version = self.edit_version
+        return self._text_cache
 
     def set_text(self, text: str) -> None:
         self.text.delete("1.0", "end")
         self.text.insert("1.0", text)
+        self.invalidate_highlight()
+
+    def invalidate_highlight(self) -> None:
+        # Forget what is tagged so the next pass retags the whole view; needed
+        # after bulk edits that drop tags on lines whose text did not change
+        self._last_highlight_key = None
+        self._current_line_ln = None
         self._schedule_highlight()
 
     def focus_editor(self) -> None:
@@ -155,7 +260,7 @@ class MermaidEditor(tk.Frame):
             pady=6,
             tabs=("32"),  # visual tab width
         )
-        self.text.config(yscrollcommand=self.v_scroll.set, xscrollcommand=self.h_scroll.set)
+        self.text.config(yscrollcommand=self._on_yview, xscrollcommand=self.h_scroll.set)
         self.v_scroll.config(command=self.text.yview)
         self.h_scroll.config(command=self.text.xview)
 
@@ -173,11 +278,12 @@ class MermaidEditor(tk.Frame):
 
         # Event for line number updates
         self.text.bind("<<Modified>>", self._on_modified_flag, add=True)
-        self.text.bind("<KeyRelease>", lambda e: self._event_changed(), add=True)
-        self.text.bind("<ButtonRelease-1>", lambda e: self._event_changed(), add=True)
-        self.text.bind("<MouseWheel>", lambda e: self._event_changed(), add=True)
-        self.text.bind("<Button-4>", lambda e: self._event_changed(), add=True)
-        self.text.bind("<Button-5>", lambda e: self._event_changed(), add=True)
+        self.text.bind("<Configure>", lambda e: self._schedule_highlight(), add=True)
+        self.text.bind("<KeyRelease>", lambda e: self._caret_moved(), add=True)
+        self.text.bind("<ButtonRelease-1>", lambda e: self._caret_moved(), add=True)
+        self.text.bind("<MouseWheel>", lambda e: self._on_scroll(), add=True)
+        self.text.bind("<Button-4>", lambda e: self._on_scroll(), add=True)
+        self.text.bind("<Button-5>", lambda e: self._on_scroll(), add=True)
 
     def _apply_theme(self):
         self.configure(bg=self.theme["bg"])
@@ -191,20 +297,18 @@ class MermaidEditor(tk.Frame):
         self.linenos.configure(bg=self.theme["gutter_bg"])
         # Update tag colors
         self._configure_tags()
+        self._last_highlight_key = None
         self._schedule_highlight()
 
     def _configure_tags(self):
         t = self.text
-        t.tag_configure("comment", foreground=self.theme["comment"])
-        t.tag_configure("directive", foreground=self.theme["directive"])
-        t.tag_configure("keyword", foreground=self.theme["keyword"])
-        t.tag_configure("type", foreground=self.theme["type"])
-        t.tag_configure("string", foreground=self.theme["string"])
-        t.tag_configure("number", foreground=self.theme["number"])
-        t.tag_configure("operator", foreground=self.theme["operator"])
-        t.tag_configure("arrow", foreground=self.theme["arrow"])
-        t.tag_configure("node", foreground=self.theme["node"])
-        t.tag_configure("error", foreground=self.theme["error"], underline=True)
+        c = self.theme
+        for tag in ("comment", "directive", "keyword", "type", "string",
+                    "number", "operator", "arrow", "node"):
+            t.tag_configure(tag, foreground=c[tag])
+        t.tag_configure("error", foreground=c["error"], underline=True)
+        t.tag_configure("match", background=c["match_bg"])
+        t.tag_configure("current_line", background=c["current_line"])
         t.tag_configure("syntax_error_line", background="#ffecec")   # light red line tint
         t.tag_configure("syntax_error_col", underline=True, foreground="#d00")
 
@@ -213,19 +317,42 @@ class MermaidEditor(tk.Frame):
     def _on_modified_flag(self, event=None):
         # Reset Tk modified flag and trigger events
         self.text.tk.call(self.text._w, "edit", "modified", 0)
+        self.edit_version += 1
         self._event_changed()
 
     def _event_changed(self):
         self._schedule_highlight()
         self._schedule_change_callback()
-        self.linenos.redraw()
-        self._paint_current_line()
-        self._highlight_bracket_match()
+        self.linenos.schedule_redraw()
+        insert = self.text.index("insert")
+        # An edit can drop the tint (e.g. a replaced line) without moving the caret
+        self._paint_current_line(insert, force=True)
+        self._highlight_bracket_match(insert)
+
+    def _on_scroll(self):
+        # Scrolling only shifts the view: retag newly visible lines, nothing else.
+        # The gutter follows through _on_yview.
+        self._schedule_highlight()
+
+    def _on_yview(self, first, last):
+        # Tk reports every vertical view change here, including keyboard
+        # scrolling and see(), which have no event binding of their own
+        self.v_scroll.set(first, last)
+        self._schedule_highlight()
+        self.linenos.schedule_redraw()
+
+    def _caret_moved(self):
+        # Caret-only events: the buffer is unchanged, so skip highlighting and the change callback.
+        # Real edits still arrive through <<Modified>>.
+        insert = self.text.index("insert")
+        self._paint_current_line(insert)
+        self._highlight_bracket_match(insert)
 
     def _schedule_highlight(self):
         if not self._highlight_scheduled:
             self._highlight_scheduled = True
-            self.after(80, self.highlight_visible)
+            # Run once the current burst of events has drained, before the next repaint
+            self.after_idle(self.highlight_visible)
 
     def _schedule_change_callback(self):
         if not self._change_scheduled:
@@ -242,109 +369,166 @@ class MermaidEditor(tk.Frame):
         self._highlight_scheduled = False
         text = self.text
 
-        # Determine visible region to limit work
-        first = text.index("@0,0")
-        last = text.index("@0,%d" % (text.winfo_height()))
-        start_line = int(first.split(".")[0])
-        end_line = int(last.split(".")[0]) + 1
+        # Not laid out yet (or hidden); the <Configure> binding retries once it is
+        height = text.winfo_height()
+        if height <= 1:
+            return
+
+        # Determine visible region to limit work, never past the last line
+        start_line = _line_of(text.index("@0,0"))
+        end_line = _line_of(text.index("@0,%d" % height)) + 1
+        end_line = min(end_line, _line_of(text.index("end-1c")) + 1)
+        region_start = f"{start_line}.0"
+        region_end = f"{end_line}.0"
+
+        # Cap the work for huge (e.g. pasted single-line) content
+        segment = text.get(region_start, region_end)[:_HIGHLIGHT_CHAR_LIMIT]
+
+        # Nothing to do if the same text is still on screen at the same place
+        key = (start_line, end_line, segment)
+        prev_key = self._last_highlight_key
+        if key == prev_key:
+            return
+        self._last_highlight_key = key
+
+        # Same view as last time: only retag the lines that changed.
+        # Tags on untouched lines move with the text, so they stay correct.
+        if prev_key is not None and prev_key[0] == start_line:
+            lines = segment.split("\n")
+            lo, hi = _changed_lines(prev_key[2].split("\n"), lines)
+            if not any("%%{" in ln and "}%%" not in ln for ln in lines):
+                if lo < hi:
+                    sub = "\n".join(lines[lo:hi]) + ("\n" if hi < len(lines) else "")
+                    self._highlight_region(start_line + lo, start_line + hi, sub)
+                return
+
+        self._highlight_region(start_line, end_line, segment)
+
+    def _highlight_region(self, start_line: int, end_line: int, segment: str):
+        text = self.text
         region_start = f"{start_line}.0"
         region_end = f"{end_line}.0"
 
         # Clear token tags in region
-        for tag in ("comment", "directive", "keyword", "type", "string",
-                    "number", "operator", "arrow", "node", "error"):
+        for tag in TOKEN_TAGS + ("error",):
             text.tag_remove(tag, region_start, region_end)
 
-        segment = text.get(region_start, region_end)
-
-        # Apply patterns
-        for tag, pattern in TOKENS:
-            for m in pattern.finditer(segment):
-                s, e = m.span()
-                s_idx = self._index_add(region_start, s, segment)
-                e_idx = self._index_add(region_start, e, segment)
-                text.tag_add(tag, s_idx, e_idx)
+        # Offsets of every newline in the segment, with -1 as the virtual start of line 0
+        newlines = [-1]
+        newlines.extend(m.start() for m in _NEWLINE_RE.finditer(segment))
+
+        # Apply patterns, collecting ranges so each tag is added with one Tcl call
+        ranges: dict[str, list[str]] = defaultdict(list)
+        for m in _MASTER_RE.finditer(segment):
+            tag = m.lastgroup
+            if tag == "ident":
+                word = m.group().casefold()
+                if word in MERMAID_KEYWORDS:
+                    tag = "keyword"
+                elif word in MERMAID_TYPES:
+                    tag = "type"
+                else:
+                    continue
+            s, e = m.span()
+            ranges[tag] += (
+                self._index_add(start_line, s, newlines),
+                self._index_add(start_line, e, newlines),
+            )
+        for tag, indices in ranges.items():
+            text.tk.call(text._w, "tag", "add", tag, *indices)
 
         # Simple error underline for unclosed quotes on the visible lines
-        self._highlight_unclosed_strings(segment, region_start)
-
-    def _index_add(self, start_index: str, offset: int, text_segment: str) -> str:
-        # Convert byte-offset like span to Tk index relative to region_start
-        # Count newlines up to offset, compute column in last line
-        upto = text_segment[:offset]
-        line = upto.count("\n")
-        if line == 0:
-            col = len(upto)
-        else:
-            col = len(upto.split("\n")[-1])
-        base_line = int(start_index.split(".")[0])
+        self._highlight_unclosed_strings(segment, start_line)
+
+    def _index_add(self, base_line: int, offset: int, newlines: list[int]) -> str:
+        # Convert a character offset in the segment to a Tk index, using the
+        # precomputed newline offsets to find its line and column
+        line = bisect_right(newlines, offset - 1) - 1
+        col = offset - newlines[line] - 1
         return f"{base_line + line}.{col}"
 
-    def _highlight_unclosed_strings(self, segment: str, region_start: str):
-        # Detect odd counts of quotes on a line. Quick heuristic.
-        lines = segment.split("\n")
-        line_no = int(region_start.split(".")[0])
-        for i, line in enumerate(lines):
-            # Count quotes that are not escaped
-            dq = len(re.findall(r'(?<!\\)"', line))
-            sq = len(re.findall(r"(?<!\\)'", line))
-            if dq % 2 == 1 or sq % 2 == 1:
-                s_idx = f"{line_no + i}.0"
-                e_idx = f"{line_no + i}.end"
-                self.text.tag_add("error", s_idx, e_idx)
+    def _highlight_unclosed_strings(self, segment: str, start_line: int):
+        # Detect odd counts of quotes on a line. Quick heuristic, done in one
+        # pass over the segment by tracking quote parity up to each newline.
+        ranges: list[str] = []
+        line_no = start_line
+        dq = sq = False
+        for m in _QUOTE_OR_NL_RE.finditer(segment):
+            ch = m.group()
+            if ch == "\n":
+                if dq or sq:
+                    ranges += (f"{line_no}.0", f"{line_no}.end")
+                line_no += 1
+                dq = sq = False
+            elif ch == '"':
+                dq = not dq
+            else:
+                sq = not sq
+        if dq or sq:
+            ranges += (f"{line_no}.0", f"{line_no}.end")
+        if ranges:
+            self.text.tk.call(self.text._w, "tag", "add", "error", *ranges)
 
     # Current line background
-    def _paint_current_line(self):
-        self.text.tag_remove("current_line", "1.0", "end")
-        cur = self.text.index("insert").split(".")[0]
+    def _paint_current_line(self, insert: Optional[str] = None, force: bool = False):
+        cur = _line_of(insert or self.text.index("insert"))
+        # Caret moves within a line need no work; edits pass force
+        if cur == self._current_line_ln and not force:
+            return
+        # Remove only the previously painted range; it may have shifted with edits,
+        # so ask Tk where it is rather than trusting the old line number
+        old = self.text.tag_ranges("current_line")
+        if old:
+            self.text.tk.call(self.text._w, "tag", "remove", "current_line", *old)
         self.text.tag_add("current_line", f"{cur}.0", f"{cur}.0 lineend+1c")
+        self._current_line_ln = cur
 
     # Bracket match highlight for (), [], {}
-    def _highlight_bracket_match(self):
-        self.text.tag_remove("match", "1.0", "end")
-        self.text.tag_configure("match", background=self.theme["match_bg"])
-        idx = self.text.index("insert")
+    def _highlight_bracket_match(self, insert: Optional[str] = None):
+        idx = insert or self.text.index("insert")
         prev = self.text.get(f"{idx} -1c")
-        pairs = {"(": ")", "[": "]", "{": "}"}
-        revpairs = {")": "(", "]": "[", "}": "{"}
-        if prev in pairs:
-            match = self._find_matching_forward(idx + " -1c", prev, pairs[prev])
-            if match:
-                self.text.tag_add("match", idx + " -1c", idx)
-                self.text.tag_add("match", match, f"{match} +1c")
-        elif prev in revpairs:
-            match = self._find_matching_backward(idx + " -1c", prev, revpairs[prev])
-            if match:
-                self.text.tag_add("match", idx + " -1c", idx)
-                self.text.tag_add("match", match, f"{match} +1c")
+        # Clear only the previously tagged pair, never the whole buffer.
+        # Look it up via tag_ranges since edits may have moved it.
+        if self._match_tagged:
+            old = self.text.tag_ranges("match")
+            if old:
+                self.text.tk.call(self.text._w, "tag", "remove", "match", *old)
+            self._match_tagged = False
+        if prev in _OPEN_TO_CLOSE:
+            match = self._find_matching_forward(idx + " -1c", prev, _OPEN_TO_CLOSE[prev])
+        elif prev in _CLOSE_TO_OPEN:
+            match = self._find_matching_backward(idx + " -1c", prev, _CLOSE_TO_OPEN[prev])
+        else:
+            return
+        if match:
+            self.text.tk.call(self.text._w, "tag", "add", "match",
+                              f"{idx} -1c", idx, match, f"{match} +1c")
+            self._match_tagged = True
 
     def _find_matching_forward(self, start, open_ch, close_ch):
+        # Fetch the text once and walk it in Python rather than one Tk call per character
+        buf = self.text.get(start, f"{start} +{_BRACKET_SCAN_LIMIT}c")
         depth = 0
-        i = self.text.index(start)
-        end = self.text.index("end-1c")
-        while self.text.compare(i, "<", end):
-            ch = self.text.get(i)
+        for k, ch in enumerate(buf):
             if ch == open_ch:
                 depth += 1
             elif ch == close_ch:
                 depth -= 1
                 if depth == 0:
-                    return i
-            i = self.text.index(f"{i} +1c")
+                    return self.text.index(f"{start} +{k}c")
         return None
 
     def _find_matching_backward(self, start, close_ch, open_ch):
+        buf = self.text.get(f"{start} -{_BRACKET_SCAN_LIMIT}c", f"{start} +1c")
         depth = 0
-        i = self.text.index(start)
-        while self.text.compare(i, ">", "1.0"):
-            ch = self.text.get(i)
+        for k in range(len(buf) - 1, -1, -1):
+            ch = buf[k]
             if ch == close_ch:
                 depth += 1
             elif ch == open_ch:
                 depth -= 1
                 if depth == 0:
-                    return i
-            i = self.text.index(f"{i} -1c")
+                    return self.text.index(f"{start} -{len(buf) - 1 - k}c")
         return None
 
     # Key bindings: indent, outdent, tab handling, comment toggle, basic auto indent
@@ -355,6 +539,12 @@ class MermaidEditor(tk.Frame):
         t.bind("<Shift-Tab>", self._outdent_selection)
         t.bind("<Return>", self._auto_indent_newline)
 
+        # These can delete and reinsert identical text (undoing Replace All, pasting
+        # over the same content), which drops tags without changing the visible
+        # text the incremental highlighter diffs against; retag the whole view
+        for seq in ("<<Undo>>", "<<Redo>>", "<<Paste>>", "<<Cut>>", "<<Clear>>"):
+            t.bind(seq, lambda e: self.invalidate_highlight(), add=True)
+
         # Robust Ctrl+/ (toggle comment) across layouts/platforms
         comment_bindings = (
             "<Control-/>",          # works on many
@@ -370,21 +560,13 @@ class MermaidEditor(tk.Frame):
             except tk.TclError:
                 pass  # silently skip unsupported sequences
 
-        # mark modified to trigger <<Modified>>
-        def _key(event):
-            self.text.event_generate("<<Change>>")
-            return None
-        t.bind("<Key>", _key, add=True)
-
     def _get_selection_lines(self):
         t = self.text
-        try:
-            start = t.index("sel.first")
-            end = t.index("sel.last")
-        except tk.TclError:
-            cur = t.index("insert")
-            return int(cur.split(".")[0]), int(cur.split(".")[0])
-        return int(start.split(".")[0]), int(end.split(".")[0])
+        sel = t.tag_ranges("sel")
+        if not sel:
+            cur = _line_of(t.index("insert"))
+            return cur, cur
+        return _line_of(str(sel[0])), _line_of(str(sel[-1]))
 
     def _indent_selection(self, event=None):
         t = self.text
@@ -407,10 +589,8 @@ class MermaidEditor(tk.Frame):
 
     def _auto_indent_newline(self, event=None):
         t = self.text
-        cur = t.index("insert")
-        line_start = f"{cur.split('.')[0]}.0"
-        current_line = t.get(line_start, f"{line_start} lineend")
-        indent = re.match(r"[ \t]*", current_line).group(0)
+        current_line = t.get("insert linestart", "insert lineend")
+        indent = _LEADING_WS_RE.match(current_line).group(0)
         t.insert("insert", "\n" + indent)
         return "break"
 
@@ -425,15 +605,15 @@ class MermaidEditor(tk.Frame):
             line_text = lines[i]
             if all_commented:
                 # remove %%
-                m = re.match(r"[ \t]*%%[ ]?", line_text)
+                m = _LEADING_COMMENT_RE.match(line_text)
                 if m:
                     start = f"{ln}.0+{m.start()}c"
                     end = f"{ln}.0+{m.end()}c"
                     t.delete(start, end)
             else:
                 # add %%
-                lead = re.match(r"[ \t]*", line_text).group(0)
-                t.insert(f"{ln}.0+{len(lead)}c", "%% ")
+                lead = _LEADING_WS_RE.match(line_text).end()
+                t.insert(f"{ln}.0+{lead}c", "%% ")
         return "break"
     
     def clear_error_highlights(self) -> None:
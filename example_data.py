@@ -4,7 +4,7 @@
 # and released under the MIT license.
 
 from __future__ import annotations
-from typing import Dict, List
+from typing import Dict, Tuple
 
 EXAMPLES: Dict[str, str] = {
     "Flowchart": r"""flowchart LR
@@ -364,9 +364,11 @@ EXAMPLES: Dict[str, str] = {
     # """,
 }
 
-def list_examples() -> List[str]:
-    """Return the available example names."""
-    return sorted(EXAMPLES.keys())
+_EXAMPLE_NAMES: Tuple[str, ...] = tuple(sorted(EXAMPLES))
+
+def list_examples() -> Tuple[str, ...]:
+    """Return the available example names, sorted."""
+    return _EXAMPLE_NAMES
 
 def get_example(name: str) -> str:
     """Return a Mermaid source by name. Raises KeyError if not found."""
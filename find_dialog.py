@@ -1,15 +1,25 @@
 # find_dialog.py
 import tkinter as tk
 from tkinter import ttk
+from bisect import bisect_left
+from typing import Callable, Optional
 
 class FindReplaceDialog(tk.Toplevel):
-    def __init__(self, master, text_widget: tk.Text, *args, **kwargs):
+    def __init__(self, master, text_widget: tk.Text, *args,
+                 version: Optional[Callable[[], int]] = None,
+                 on_bulk_edit: Optional[Callable[[], None]] = None, **kwargs):
         super().__init__(master, *args, **kwargs)
         self.title("Find / Replace")
         self.resizable(False, False)
         self.transient(master)  # stay on top-ish of main window
 
         self.text_widget = text_widget
+        # Optional buffer version getter; enables caching of match positions
+        self._version = version
+        self._match_cache: Optional[tuple[str, int, list[tuple[int, int]]]] = None
+        self._match_tagged = False
+        # Optional hook run after Replace All so the editor can retag its view
+        self._on_bulk_edit = on_bulk_edit
 
         # state
         self.find_var = tk.StringVar()
@@ -53,7 +63,13 @@ class FindReplaceDialog(tk.Toplevel):
         self.bind("<Escape>", lambda e: self.destroy())
 
     def _clear_match_highlight(self):
-        self.text_widget.tag_remove("find_match", "1.0", "end")
+        # Only one match is ever tagged: remove that span instead of scanning the buffer
+        if not self._match_tagged:
+            return
+        self._match_tagged = False
+        ranges = self.text_widget.tag_ranges("find_match")
+        if ranges:
+            self.text_widget.tag_remove("find_match", ranges[0], ranges[-1])
 
     def _find_next(self):
         needle = self.find_var.get()
@@ -65,6 +81,59 @@ class FindReplaceDialog(tk.Toplevel):
         # start searching right after the current insert cursor
         start_index = self.text_widget.index("insert +1c")
 
+        if self._version is not None:
+            hits = self._match_positions(needle)
+            if not hits:
+                return
+            line, col = map(int, start_index.split("."))
+            i = bisect_left(hits, (line, col))
+            line, col = hits[i] if i < len(hits) else hits[0]  # wrap
+            idx = f"{line}.{col}"
+        else:
+            idx = self._search_from(needle, start_index)
+        if not idx:
+            return  # not found anywhere
+
+        # idx is like "12.5"
+        end_idx = f"{idx}+{len(needle)}c"
+
+        # highlight selection
+        self.text_widget.tag_add("sel", idx, end_idx)
+        self.text_widget.tag_add("find_match", idx, end_idx)
+        self._match_tagged = True
+
+        # move insert cursor and scroll into view
+        self.text_widget.mark_set("insert", end_idx)
+        self.text_widget.see(idx)
+
+    def _match_positions(self, needle: str) -> list[tuple[int, int]]:
+        """All match starts as (line, col), rescanned only when needle or buffer change."""
+        version = self._version()
+        cache = self._match_cache
+        # The version only moves once <<Modified>> is processed; the Tk modified
+        # flag is set synchronously, so an edit still in the queue counts as stale
+        if (cache is not None and cache[0] == needle and cache[1] == version
+                and not self.text_widget.edit_modified()):
+            return cache[2]
+
+        hits = []
+        idx = "1.0"
+        while True:
+            idx = self.text_widget.search(
+                pattern=needle,
+                index=idx,
+                nocase=False,
+                stopindex="end"
+            )
+            if not idx:
+                break
+            line, col = idx.split(".")
+            hits.append((int(line), int(col)))
+            idx = f"{idx}+{len(needle)}c"
+        self._match_cache = (needle, version, hits)
+        return hits
+
+    def _search_from(self, needle: str, start_index: str) -> str:
         # search forward
         idx = self.text_widget.search(
             pattern=needle,
@@ -81,19 +150,7 @@ class FindReplaceDialog(tk.Toplevel):
                 nocase=False,
                 stopindex="end"
             )
-            if not idx:
-                return  # not found anywhere
-
-        # idx is like "12.5"
-        end_idx = f"{idx}+{len(needle)}c"
-
-        # highlight selection
-        self.text_widget.tag_add("sel", idx, end_idx)
-        self.text_widget.tag_add("find_match", idx, end_idx)
-
-        # move insert cursor and scroll into view
-        self.text_widget.mark_set("insert", end_idx)
-        self.text_widget.see(idx)
+        return idx
 
     def _replace_one(self):
         needle = self.find_var.get()
@@ -113,6 +170,7 @@ class FindReplaceDialog(tk.Toplevel):
             # perform replacement
             self.text_widget.delete(sel_start, sel_end)
             self.text_widget.insert(sel_start, repl)
+            self._match_cache = None
             # after replace, move cursor to end of inserted text
             after_idx = f"{sel_start}+{len(repl)}c"
             self.text_widget.mark_set("insert", after_idx)
@@ -129,28 +187,33 @@ class FindReplaceDialog(tk.Toplevel):
 
         self._clear_match_highlight()
 
-        ranges = []
-        idx = "1.0"
-        while True:
-            idx = self.text_widget.search(
-                pattern=needle,
-                index=idx,
-                nocase=False,
-                stopindex="end"
-            )
-            if not idx:
-                break
-            end_idx = f"{idx}+{len(needle)}c"
-            ranges.append((idx, end_idx))
-            idx = end_idx  # continue search after this match
-
-        # Now perform replacements from bottom up so indices don't shift
-        for start, end in reversed(ranges):
-            self.text_widget.delete(start, end)
-            self.text_widget.insert(start, repl)
-
-        if ranges:
-            last_start, _ = ranges[-1]
-            after_last = f"{last_start}+{len(repl)}c"
-            self.text_widget.mark_set("insert", after_last)
-            self.text_widget.see(after_last)
+        # Search is literal and case-sensitive, so one split/join over the
+        # buffer does the same job as a search/delete/insert per match
+        t = self.text_widget
+        content = t.get("1.0", "end-1c")
+        parts = content.split(needle)
+        if len(parts) == 1 or repl == needle:
+            return
+        # Rewrite only the span from the first match to the end of the last one,
+        # so the text and tags around it are left alone
+        start = len(parts[0])
+        old_end = len(content) - len(parts[-1])
+        new_mid = repl + repl.join(parts[1:-1]) + repl
+
+        # One undo step for the whole operation
+        autosep = t.cget("autoseparators")
+        t.configure(autoseparators=False)
+        try:
+            t.edit_separator()
+            t.delete(f"1.0+{start}c", f"1.0+{old_end}c")
+            t.insert(f"1.0+{start}c", new_mid)
+            t.edit_separator()
+        finally:
+            t.configure(autoseparators=autosep)
+        # Unchanged lines inside the span lost their tags too
+        if self._on_bulk_edit:
+            self._on_bulk_edit()
+
+        after_idx = f"1.0+{start + len(new_mid)}c"
+        t.mark_set("insert", after_idx)
+        t.see(after_idx)
@@ -1,28 +1,112 @@
 #!/usr/bin/env python3
 import os
-import sys
-import uuid
 import shutil
 import subprocess
 import threading
-import tempfile
+import queue
+import time
 from pathlib import Path
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from PIL import Image, ImageTk
-from datetime import datetime
 from code_editor import MermaidEditor
 from preview_pane import PreviewPane
 from find_dialog import FindReplaceDialog
-from example_data import list_examples, get_example
 import re
 import json
-import webbrowser
+import hashlib
 from theme import ThemeManager
-from PIL import ImageGrab
 
 APP_VERSION = "0.2.4"
 
+_CACHE_DIR = Path.home() / ".cache" / "mermaid_studio"
+_CONFIG_DIR = Path.home() / ".config" / "mermaid_studio"
+# Rendered PNGs keyed by a hash of the source + render options
+_PNG_CACHE_DIR = _CACHE_DIR / "by_hash"
+_PNG_CACHE_MAX = 64
+# Unsaved previews render at the preview pane's width (rounded up to a step so
+# small resizes keep hitting the PNG cache); exports and saved documents' PNGs
+# render at full width
+_EXPORT_WIDTH = 2048
+_MIN_PREVIEW_WIDTH = 400
+_PREVIEW_WIDTH_STEP = 100
+# Quiet period after the last edit before auto render kicks in
+_AUTO_RENDER_DELAY_MS = 600
+# An edit this long after the previous render renders straight away
+_AUTO_RENDER_IDLE_S = 2.0
+_RENDER_TIMEOUT_S = 45
+# Cancel/timeout send SIGTERM so node can close its headless Chromium; SIGKILL
+# (which would orphan the browser) only if it is still running after this long
+_TERMINATE_GRACE_S = 3
+_PUPPETEER_CONFIG = _CONFIG_DIR / "puppeteer.json"
+# Discovered chrome/mmdc locations, reused across launches
+_TOOL_PATHS_FILE = _CONFIG_DIR / "paths.json"
+_TOOL_PATHS_MAX_AGE_S = 7 * 24 * 3600
+# Long-lived Node helper that keeps one browser open between renders
+_MMDC_SERVER_SCRIPT = Path(__file__).parent / "mmdc_server.mjs"
+# mmdc can exit 0 and still report a mermaid error; any of these marks a failed render
+_ERR_MARKER_RE = re.compile(
+    r"Syntax error in text|Parse error on line|Lexical error on line|Expecting '"
+)
+# One pass over mermaid's error text: parse/lexical error lines, any other
+# 'line N' mention (used only when there is no parse error), and 'column N'.
+# The error line is read in a lookahead so a 'column N' inside that span still matches.
+_ERR_POS_RE = re.compile(
+    r"(?:Parse|Lexical)\s+error(?=.*?line\s+(?P<err_line>\d+))"
+    r"|\bline\s+(?P<line>\d+)\b"
+    r"|\bcolumn\s+(?P<col>\d+)\b",
+    re.IGNORECASE | re.DOTALL,
+)
+_NONBLANK_LINE_RE = re.compile(r"\S[^\n]*")
+# The error log shows this many lines until "Show full log" is clicked
+_ERROR_LOG_MAX_LINES = 200
+# Source that already carries its own config (frontmatter or init directive)
+_OWN_CONFIG_RE = re.compile(r"\s*(?:---|%%\{init:)")
+# First token of the first line that is not blank or a %% comment
+_DIAGRAM_TYPE_RE = re.compile(r"^[ \t\r\f\v]*(?!%%)([A-Za-z0-9_.:-]+)", re.MULTILINE)
+
+# Diagram types for _maybe_warn_diagram_type.
+# This is our "known good / common" set for current CLI versions.
+# NOTE: All are stored lowercase.
+_STABLE_TYPES = frozenset({
+    "flowchart", "flowchart-lr", "flowchart-rl", "flowchart-tb", "flowchart-bt",
+    "graph",
+    "sequencediagram",
+    "classdiagram",
+    "statediagram", "statediagram-v2",
+    "erdigram", "erdiagram",
+    "journey",
+    "gantt",
+    "pie",
+    "quadrantchart",
+    "requirementdiagram",
+    "gitgraph", "gitgraph",  # both spellings collapse to 'gitgraph' anyway after .lower()
+    "c4context", "c4container", "c4component", "c4dynamic",
+    "mindmap",
+    "timeline",
+    "sankey", "sankey-beta",
+    "xychart", "xychart-beta",
+    "blockdiagram",
+    "packet",
+    "kanban",
+    "architecture",    # <-- newer/experimental in some Mermaid builds
+    "radar",
+    "treemap",
+})
+
+# Things that exist in Mermaid spec/docs but are still considered
+# experimental / version-sensitive. We'll gently warn on these.
+_POTENTIALLY_UNSTABLE = frozenset({
+    "architecture", "architecture-beta",
+    "c4context", "c4container", "c4component", "c4dynamic",
+    "quadrantchart",
+    "sankey", "sankey-beta",
+    "xychart", "xychart-beta",
+    "kanban",
+    "radar",
+    "treemap", "treemap-beta",
+    "blockdiagram",
+})
+
 APP_TITLE = "Mermaid Studio - Python UI"
 DEFAULT_SAMPLE = """flowchart TD
     A[Friday afternoon] --> B{Do you feel lucky?}
@@ -44,15 +128,32 @@ class MermaidStudio(tk.Tk):
         # Theme manager
         self.theme_manager = ThemeManager(self)
 
-        # Chrome path
-        self.chrome_path: str | None = self._find_chrome()
-
+        # Chrome and mmdc paths
+        self.chrome_path: str | None = None
+        self.mmdc_path: str | None = None
+        self._load_tool_paths()
 
         # State
         self.current_file: Path | None = None
         self.last_png: Path | None = None
-        self.mmdc_path: str | None = self._find_mmdc()
-        self.render_lock = threading.Lock()
+        self._mmdc_proc: subprocess.Popen | None = None
+        # Guards starting/stopping the helper: the main thread and the render worker both do it
+        self._mmdc_lock = threading.Lock()
+        self._mmdc_req_id = 0
+        self._mmdc_server_failed = False
+        self._mmdc_version: str | None = None   # part of the PNG cache key; None = not read yet
+        # One render worker; at most one job waits behind it and newer jobs replace it
+        self._render_cond = threading.Condition()
+        self._pending_render: list = []
+        self._render_busy = False
+        self._render_gen = 0                # bumped per render request; older results are dropped
+        self._prewarm: list = []            # example renders for the PNG cache, run when idle
+        self._export_jobs: list = []        # full-width export renders; run first, never superseded
+        self._render_proc: subprocess.Popen | None = None   # one-shot mmdc run in flight
+        self._render_cancelled = False
+        # Worker threads never touch Tk: they post callables here, drained on the main thread
+        self._ui_queue: queue.Queue = queue.Queue()
+        self._ui_draining = False
         self.dirty = False
         self.protocol("WM_DELETE_WINDOW", self._on_exit)
         self._find_dialog = None
@@ -60,26 +161,50 @@ class MermaidStudio(tk.Tk):
                 
         # Recent files state
         self.recent_files = []
-        self.recent_files_path = Path.home() / ".config" / "mermaid_studio" / "recent.json"
+        self._recent_save_job = None         # pending write-behind of recent.json
+        self.recent_files_path = _CONFIG_DIR / "recent.json"
         self._load_recent_files()
 
         # Auto render state
         self.auto_render_var = tk.BooleanVar(value=False)
         self.auto_render_job = None          # handle from after()
-        self.pending_autorender = False      # true if edits happened during an active render
+        self._auto_render_deadline = 0.0     # monotonic time the pending auto render is due
         self.last_rendered_hash = None       # hash of last rendered code
         self._code_hash_being_rendered = None
+        self._edit_hash = None              # (editor version, key) so the buffer is hashed once per edit
+        self._last_changed_hash = None      # key seen by the previous change callback
+        self._last_render_ts = 0.0          # monotonic time the last render finished
+        self._last_render_target = None     # (render key, output png, width) of the last good render
+        self._last_render_source = None     # (code, header, diagram theme, background) behind it
 
         self._build_ui()
         self._new_document(initial_text=DEFAULT_SAMPLE)
 
+        self._render_thread = threading.Thread(target=self._render_worker, daemon=True)
+        self._render_thread.start()
+
         icon_path = Path(__file__).parent / "assets" / "appicon.png"
         try:
             self.iconphoto(False, tk.PhotoImage(file=str(icon_path)))
         except Exception as e:
             print("Icon load failed:", e)
 
+        # Start the render helper (and its browser) once the window is up
+        self.after(500, self._ensure_mmdc_server)
+
+        # Welcome box once per version, after the main window has painted
+        self.after(200, self._maybe_show_welcome)
+
+    def _maybe_show_welcome(self):
+        marker = _CONFIG_DIR / f".seen_{APP_VERSION}"
+        if marker.exists():
+            return
         messagebox.showinfo(APP_TITLE, f"Mermaid Studio v{APP_VERSION}\n \nSimple Python UI wrapper for mermaid-cli.")
+        try:
+            marker.parent.mkdir(parents=True, exist_ok=True)
+            marker.touch()
+        except Exception:
+            pass
 
 
     # - UI building
@@ -96,6 +221,7 @@ class MermaidStudio(tk.Tk):
 
         # --- Open Recent submenu ---
         self.recent_menu = tk.Menu(file_menu, tearoff=0)
+        self._recent_menu_items: list[str] = []   # paths currently listed, in menu order
         file_menu.add_cascade( label="Recent", menu=self.recent_menu)
 
         file_menu.add_separator()
@@ -129,17 +255,17 @@ class MermaidStudio(tk.Tk):
         self.bind_all("<Control-F>", lambda e: self._open_find_dialog())  # just in case
 
         # Example menu
-        examples_menu = tk.Menu(menubar, tearoff=0)
-        for name in sorted(list_examples()):
-            examples_menu.add_command(
-                label=name,
-                command=lambda n=name: self._apply_example(n)
-            )
-        menubar.add_cascade(label="Examples", menu=examples_menu)
+        # Filled on first open so example_data is not imported at startup
+        self.examples_menu = tk.Menu(menubar, tearoff=0, postcommand=self._populate_examples_menu)
+        menubar.add_cascade(label="Examples", menu=self.examples_menu)
 
         # Settings menu
         self.settings_menu = tk.Menu(menubar, tearoff=0)
         self.settings_menu.add_command(label="Set mmdc path...", command=self._set_mmdc_path)
+        self.settings_menu.add_command(label="Rescan tools", command=self._rescan_tools_clicked)
+        self.settings_menu.add_command(
+            label="Re-render (ignore cache)", command=lambda: self._render_clicked(force=True)
+        )
 
         # Mermaid diagram theme submenu
         self.diagram_theme_var = tk.StringVar(value=self.theme_manager.get_diagram_theme())
@@ -169,6 +295,7 @@ class MermaidStudio(tk.Tk):
 
         # UI Theme toggle (light/dark)
         self.settings_menu.add_command(label="Use Dark Theme", command=self._toggle_theme_clicked)
+        self._theme_toggle_index = self.settings_menu.index("end")
 
         self.settings_menu.add_separator()
         self.settings_menu.add_command(label="About", command=self._about)
@@ -200,6 +327,11 @@ class MermaidStudio(tk.Tk):
         self.render_btn = ttk.Button(self.toolbar, text="Render", command=self._render_clicked)
         self.render_btn.pack(side="left", padx=(0, 8))
 
+        self.cancel_btn = ttk.Button(
+            self.toolbar, text="Cancel", command=self._cancel_render_clicked, state="disabled"
+        )
+        self.cancel_btn.pack(side="left", padx=(0, 8))
+
         self.auto_cb = ttk.Checkbutton(
             self.toolbar, text="Auto render", variable=self.auto_render_var,
             command=self._on_autorender_toggle
@@ -238,6 +370,10 @@ class MermaidStudio(tk.Tk):
         self.err_text.configure(yscrollcommand=self.err_scroll.set)
         self.err_text.grid(row=0, column=0, sticky="nsew")
         self.err_scroll.grid(row=0, column=1, sticky="ns")
+        self.err_more_btn = ttk.Button(self.err_frame, text="Show full log", command=self._errorlog_show_full)
+        self.err_more_btn.grid(row=1, column=0, columnspan=2, sticky="e")
+        self.err_more_btn.grid_remove()
+        self._error_log_full = ""
         self.err_frame.rowconfigure(0, weight=1)
         self.err_frame.columnconfigure(0, weight=1)
 
@@ -255,8 +391,6 @@ class MermaidStudio(tk.Tk):
         preview_frame.rowconfigure(0, weight=1)
         preview_frame.columnconfigure(0, weight=1)
 
-
-        from preview_pane import PreviewPane
         self.preview = PreviewPane(preview_frame, bg="#f5f5f5")
         self.preview.grid(row=0, column=0, sticky="nsew")
 
@@ -285,7 +419,21 @@ class MermaidStudio(tk.Tk):
     
     def _rebuild_recent_menu(self):
         """Refresh the Open Recent submenu."""
-        
+        old, new = self._recent_menu_items, list(self.recent_files)
+        self._recent_menu_items = new
+        if old and new:
+            # Same layout (files, separator, Clear list): only relabel entries that changed.
+            # Entry commands go by position, so existing ones never need replacing.
+            for idx, fpath in enumerate(new):
+                label = f"{idx + 1}. {os.path.basename(fpath)}"
+                if idx >= len(old):
+                    self.recent_menu.insert_command(idx, label=label, command=self._recent_command(idx))
+                elif old[idx] != fpath:
+                    self.recent_menu.entryconfigure(idx, label=label)
+            for _ in range(len(old) - len(new)):
+                self.recent_menu.delete(len(new))
+            return
+
         self.recent_menu.delete(0, "end")
 
         if not self.recent_files:
@@ -297,11 +445,9 @@ class MermaidStudio(tk.Tk):
         else:
             # Add each path
             for idx, fpath in enumerate(self.recent_files, start=1):
-                nice_label = Path(fpath).name
-                full_path = fpath  # capture now for lambda default
                 self.recent_menu.add_command(
-                    label=f"{idx}. {nice_label}",
-                    command=lambda p=full_path: self._open_recent_file(p)
+                    label=f"{idx}. {os.path.basename(fpath)}",
+                    command=self._recent_command(idx - 1)
                 )
             self.recent_menu.add_separator()
             self.recent_menu.add_command(
@@ -309,6 +455,9 @@ class MermaidStudio(tk.Tk):
                 command=self._clear_recent_files
             )
 
+    def _recent_command(self, idx: int):
+        return lambda: self._open_recent_file(self._recent_menu_items[idx])
+
     def _on_diagram_theme_selected(self, theme_name: str):
         
         self.theme_manager.set_diagram_theme(theme_name)
@@ -323,18 +472,12 @@ class MermaidStudio(tk.Tk):
         self._update_theme_menu_label()
 
     def _update_theme_menu_label(self):
-        # In self.settings_menu:
-        # index 0 = "Set mmdc path..."
-        # index 1 = theme toggle item
-        # index 2 = separator
-        # index 3 = "About"
-
         if self.theme_manager.current_name == "dark":
             new_label = "Use Light Theme"
         else:
             new_label = "Use Dark Theme"
 
-        self.settings_menu.entryconfig(3, label=new_label)
+        self.settings_menu.entryconfig(self._theme_toggle_index, label=new_label)
 
     def _on_sketch_toggled(self):
         enabled = bool(self.sketch_var.get())
@@ -352,9 +495,21 @@ class MermaidStudio(tk.Tk):
 
         cleaned = text.strip()
 
+        # Long traces: only the head goes into the Text widget, the rest on request
+        parts = cleaned.split("\n", _ERROR_LOG_MAX_LINES)
+        if len(parts) > _ERROR_LOG_MAX_LINES:
+            self._error_log_full = cleaned
+            hidden = parts[-1].count("\n") + 1
+            shown = "\n".join(parts[:-1]) + f"\n... {hidden} more lines"
+            self.err_more_btn.grid()
+        else:
+            self._error_log_full = ""
+            shown = cleaned
+            self.err_more_btn.grid_remove()
+
         self.err_text.configure(state="normal")
         self.err_text.delete("1.0", "end")
-        self.err_text.insert("1.0", cleaned + "\n")
+        self.err_text.insert("1.0", shown + "\n")
         self.err_text.configure(state="disabled")
         self.err_frame.grid()  # make sure it's visible
 
@@ -362,11 +517,23 @@ class MermaidStudio(tk.Tk):
             status_msg = "Render failed - see error log"
         self._set_status(status_msg)
 
+    def _errorlog_show_full(self):
+        if not self._error_log_full:
+            return
+        self.err_text.configure(state="normal")
+        self.err_text.delete("1.0", "end")
+        self.err_text.insert("1.0", self._error_log_full + "\n")
+        self.err_text.configure(state="disabled")
+        self._error_log_full = ""
+        self.err_more_btn.grid_remove()
+
     def _errorlog_hide(self):
         
         self.err_text.configure(state="normal")
         self.err_text.delete("1.0", "end")
         self.err_text.configure(state="disabled")
+        self._error_log_full = ""
+        self.err_more_btn.grid_remove()
         self.err_frame.grid_remove()
 
     def _editor_event(self, sequence: str):
@@ -386,10 +553,29 @@ class MermaidStudio(tk.Tk):
 
 
     def _on_editor_changed(self):
+        code_hash = self._current_code_key()
+        if code_hash == self._last_changed_hash:
+            # e.g. typed and undone within one debounce window
+            return
+        self._last_changed_hash = code_hash
         self.dirty = True
         self._set_status("Edited")
         if self.auto_render_var.get():
-            self._schedule_autorender()
+            if code_hash == self.last_rendered_hash:
+                # Back to what the preview already shows: drop any queued render and
+                # make one already running discard its result, or it would replace this
+                self._cancel_autorender()
+                with self._render_cond:
+                    self._pending_render.clear()
+                self._render_gen += 1
+                return
+            idle = time.monotonic() - self._last_render_ts > _AUTO_RENDER_IDLE_S
+            if idle and self.auto_render_job is None and not self._render_active():
+                # Leading edge: first edit after a quiet spell renders immediately
+                self._auto_render_fire()
+            else:
+                # Trailing edge: a burst of edits (or one during a render) collapses into one render
+                self._schedule_autorender()
 
     def _on_autorender_toggle(self):
         if self.auto_render_var.get():
@@ -398,17 +584,19 @@ class MermaidStudio(tk.Tk):
             self._cancel_autorender()
             self._set_status("Auto render off")
 
-    def _schedule_autorender(self, delay_ms: int = 5000):
-        # reset any existing timer
-        if self.auto_render_job is not None:
-            try:
-                self.after_cancel(self.auto_render_job)
-            except Exception:
-                pass
-            self.auto_render_job = None
-        # schedule a new one
-        self.auto_render_job = self.after(delay_ms, self._auto_render_fire)
-        self._set_status(f"Auto render in {delay_ms // 1000} s")
+    def _schedule_autorender(self, delay_ms: int = _AUTO_RENDER_DELAY_MS):
+        # Push the deadline back; an armed timer re-arms itself for the rest when it fires
+        self._auto_render_deadline = time.monotonic() + delay_ms / 1000
+        if self.auto_render_job is None:
+            self.auto_render_job = self.after(delay_ms, self._auto_render_due)
+        self._set_status("Auto render pending")
+
+    def _auto_render_due(self):
+        remaining_ms = int((self._auto_render_deadline - time.monotonic()) * 1000)
+        if remaining_ms > 0:
+            self.auto_render_job = self.after(remaining_ms, self._auto_render_due)
+            return
+        self._auto_render_fire()
 
     def _cancel_autorender(self):
         if self.auto_render_job is not None:
@@ -422,19 +610,13 @@ class MermaidStudio(tk.Tk):
         self.auto_render_job = None
         code = self.editor.get()
         code = code if code is not None else ""
-        code_hash = hash(code)
+        code_hash = self._current_code_key()
         if not code.strip():
             self._set_status("Nothing to render")
             return
         if self.last_rendered_hash is not None and code_hash == self.last_rendered_hash:
             self._set_status("No changes since last render")
             return
-        if self.render_lock.locked():
-            
-            self.pending_autorender = True
-            self._set_status("Render in progress - will auto render next")
-            return
-        
         self._render_clicked()
 
 
@@ -527,7 +709,10 @@ class MermaidStudio(tk.Tk):
             self._find_dialog.focus_force()
             return
 
-        self._find_dialog = FindReplaceDialog(self, self.editor.text)
+        self._find_dialog = FindReplaceDialog(
+            self, self.editor.text, version=lambda: self.editor.edit_version,
+            on_bulk_edit=self.editor.invalidate_highlight,
+        )
 
         self._center_find_dialog(self._find_dialog)
 
@@ -557,6 +742,8 @@ class MermaidStudio(tk.Tk):
 
     def _on_exit(self):
         if self._maybe_prompt_save():
+            self._flush_recent_files()
+            self._stop_mmdc_server()
             self.destroy()
 
     def _export_png_as(self):
@@ -571,14 +758,60 @@ class MermaidStudio(tk.Tk):
         )
         if not dest:
             return
+        target = self._last_render_target
+        if target is not None and target[2] != _EXPORT_WIDTH:
+            # Preview renders are pane-sized: re-render what the preview shows at full width
+            self._export_async(Path(dest))
+            return
         try:
             shutil.copy(self.last_png, dest)
             self.status.configure(text=f"Exported PNG to {Path(dest).name}")
         except Exception as e:
             messagebox.showerror("Error", f"Could not export PNG:\n{e}")
 
+    def _populate_examples_menu(self):
+        # Every open: examples missing from the PNG cache for the current settings get queued
+        self._prewarm_examples()
+        if self.examples_menu.index("end") is not None:
+            return
+        from example_data import list_examples
+
+        for name in list_examples():
+            self.examples_menu.add_command(
+                label=name,
+                command=lambda n=name: self._apply_example(n)
+            )
+
+    def _prewarm_examples(self):
+        """
+        Queue background renders of the examples into the PNG cache, so picking
+        one and pressing Render is a cache hit. Only used with the persistent
+        helper; the render worker runs these when it has nothing else to do.
+        """
+        if not self.mmdc_path or self._mmdc_server_failed:
+            return
+        from example_data import EXAMPLES
+
+        sketch_enabled = self.theme_manager.get_sketch_mode()
+        diagram_theme = self.theme_manager.get_diagram_theme()
+        bg_for_render = self.theme_manager.get_render_background()
+        width = self._preview_render_width()
+        jobs = []
+        for code in EXAMPLES.values():
+            header = self._sketch_header(code, sketch_enabled, diagram_theme)
+            key = self._render_cache_key(code, diagram_theme, bg_for_render, width, header=header)
+            cache_png = _PNG_CACHE_DIR / f"{key}.png"
+            if not cache_png.exists():
+                jobs.append((header + code, cache_png, bg_for_render, diagram_theme, width))
+        with self._render_cond:
+            self._prewarm[:] = jobs
+            if jobs:
+                self._render_cond.notify()
+
     def _apply_example(self, name: str):
         """Load an example diagram into the editor."""
+        from example_data import get_example
+
         try:
             code = get_example(name)
         except KeyError:
@@ -595,13 +828,11 @@ class MermaidStudio(tk.Tk):
             data_dir = self.recent_files_path.parent
             data_dir.mkdir(parents=True, exist_ok=True)
 
-            if self.recent_files_path.exists():
-                with open(self.recent_files_path, "r", encoding="utf-8") as f:
-                    arr = json.load(f)
+            with open(self.recent_files_path, "r", encoding="utf-8") as f:
+                arr = json.load(f)
 
-                self.recent_files = [p for p in arr if Path(p).exists()]
-            else:
-                self.recent_files = []
+            # At most a handful of entries: one stat each is cheaper than listing their folders
+            self.recent_files = [p for p in arr if os.path.exists(p)]
         except Exception:
             self.recent_files = []
 
@@ -609,10 +840,26 @@ class MermaidStudio(tk.Tk):
         """Persist recent files to disk."""
         try:
             with open(self.recent_files_path, "w", encoding="utf-8") as f:
-                json.dump(self.recent_files, f, indent=2)
+                # Machine-read only: compact, and written in one call
+                f.write(json.dumps(self.recent_files, separators=(",", ":")))
         except Exception:
             pass  
 
+    def _schedule_recent_save(self):
+        # A burst of opens/saves ends up as one write
+        if self._recent_save_job is None:
+            self._recent_save_job = self.after(500, self._flush_recent_files)
+
+    def _flush_recent_files(self):
+        if self._recent_save_job is None:
+            return
+        try:
+            self.after_cancel(self._recent_save_job)
+        except Exception:
+            pass
+        self._recent_save_job = None
+        self._save_recent_files()
+
     def _add_recent_file(self, path: Path):
         """Add a file path to the MRU list and rebuild the menu."""
         p = str(path)
@@ -621,13 +868,13 @@ class MermaidStudio(tk.Tk):
         self.recent_files.insert(0, p)
         # cap at 5
         self.recent_files = self.recent_files[:5]
-        self._save_recent_files()
+        self._schedule_recent_save()
         self._rebuild_recent_menu()
 
     def _clear_recent_files(self):
         """Clear MRU list."""
         self.recent_files = []
-        self._save_recent_files()
+        self._schedule_recent_save()
         self._rebuild_recent_menu()
 
     def _open_recent_file(self, filepath: str):
@@ -637,7 +884,7 @@ class MermaidStudio(tk.Tk):
 
             messagebox.showwarning("File not found", f"{path} no longer exists.")
             self.recent_files = [f for f in self.recent_files if f != filepath]
-            self._save_recent_files()
+            self._schedule_recent_save()
             self._rebuild_recent_menu()
             return
         try:
@@ -656,7 +903,7 @@ class MermaidStudio(tk.Tk):
 
 
     # - Render
-    def _render_clicked(self):
+    def _render_clicked(self, width: int | None = None, force: bool = False):
 
         self._cancel_autorender()
 
@@ -667,51 +914,169 @@ class MermaidStudio(tk.Tk):
         code = self.editor.get()
         if code is None:
             code = ""
-        self._code_hash_being_rendered = hash(code)
-
-
-        self._maybe_warn_diagram_type(code)
-
+        self._code_hash_being_rendered = self._current_code_key()
 
         sketch_enabled = self.theme_manager.get_sketch_mode()
         diagram_theme = self.theme_manager.get_diagram_theme()
+        # Prepended by the render worker; the key hashes header and code without joining them
+        header = self._sketch_header(code, sketch_enabled, diagram_theme)
 
-        has_frontmatter = code.lstrip().startswith("---")
-        has_init_block = code.lstrip().startswith("%%{init:")
+        # If a document is saved, render PNG next to it. Otherwise, use cache path
+        if self.current_file:
+            out_dir = self.current_file.parent
+            out_png = out_dir / (self.current_file.stem + ".png")
+        else:
+            out_png = _CACHE_DIR / f"mstudio_preview.png"
+
+        if width is None:
+            # <stem>.png next to a saved document is a deliverable: full width.
+            # Only the throwaway cache preview follows the pane.
+            width = _EXPORT_WIDTH if self.current_file else self._preview_render_width()
+        bg_for_render = self.theme_manager.get_render_background()
+        key = self._render_cache_key(code, diagram_theme, bg_for_render, width, header=header)
+        target = (key, out_png, width)
+        source = (code, header, diagram_theme, bg_for_render)
+
+        self._render_gen += 1
+        # Nothing changed since the last successful render: no file work at all
+        if (not force and target == self._last_render_target
+                and self.last_png is not None and self.last_png.exists()):
+            # A failed render in between may have left its errors up; the preview is the good one
+            self.editor.clear_error_highlights()
+            self._errorlog_hide()
+            self._set_status("No changes since last render")
+            return
+
+        self._maybe_warn_diagram_type(code)
+
+        # Cheap (one mkdir syscall) and survives the cache dir being cleared mid-session
+        _CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
-        if sketch_enabled and not (has_frontmatter or has_init_block):
+        # Same source + options rendered before: skip mmdc entirely
+        cached_png = _PNG_CACHE_DIR / f"{key}.png"
+        if not force and cached_png.exists():
+            self._show_cached_render(cached_png, out_png, target=target, source=source)
+            return
 
+        self._render_async(
+            code, header=header, output_png=out_png, cache_png=cached_png,
+            target=target, width=width,
+        )
 
-            header = (
+    def _sketch_header(self, code: str, sketch_enabled: bool, diagram_theme: str) -> str:
+        # Matched in place: no lstrip() copy of the whole buffer
+        if sketch_enabled and not _OWN_CONFIG_RE.match(code):
+            return (
                 "---\n"
                 "config:\n"
                 f"  look: handDrawn\n"
                 f"  theme: {diagram_theme}\n"
                 "---\n"
             )
-            code_to_render = header + code
-        else:
-            code_to_render = code
+        return ""
 
-        cache_dir = Path.home() / ".cache" / "mermaid_studio"
-        cache_dir.mkdir(parents=True, exist_ok=True)
+    def _preview_render_width(self) -> int:
+        w = max(_MIN_PREVIEW_WIDTH, self.preview.canvas_size()[0])
+        # round up to the next step
+        return -(-w // _PREVIEW_WIDTH_STEP) * _PREVIEW_WIDTH_STEP
 
-        import uuid
-        temp_input_path = cache_dir / f"mstudio_{uuid.uuid4().hex}.mmd"
-        with open(temp_input_path, "w", encoding="utf-8") as f:
-            f.write(code_to_render)
-        # Ensure readable by confined processes
-        os.chmod(temp_input_path, 0o644)
+    def _render_active(self) -> bool:
+        return self._render_busy or bool(self._pending_render) or bool(self._export_jobs)
 
-        # If a document is saved, render PNG next to it. Otherwise, use cache path
-        if self.current_file:
-            out_dir = self.current_file.parent
-            out_png = out_dir / (self.current_file.stem + ".png")
-        else:
-            #out_png = cache_dir / f"mstudio_{uuid.uuid4().hex}.png"
-            out_png = cache_dir / f"mstudio_preview.png"
+    def _cancel_render_clicked(self):
+        if not self._render_active():
+            return
+        with self._render_cond:
+            self._pending_render.clear()
+            # Queued example renders would start right after; drop them too
+            self._prewarm.clear()
+            self._export_jobs.clear()
+            # Only flag a running job; with nothing running the flag would be
+            # left over for the next render through the helper
+            running = self._render_busy
+            self._render_cancelled = running
+        if not running:
+            self.cancel_btn.configure(state="disabled")
+            self._set_status("Render cancelled")
+            return
+        proc = self._render_proc or self._mmdc_proc
+        if proc is not None:
+            self._terminate_proc(proc)
+        self._set_status("Cancelling render...")
+
+    def _code_key(self, code: str) -> bytes:
+        # Stable across runs, unlike hash() which is salted per process
+        return hashlib.blake2b(code.encode("utf-8"), digest_size=16).digest()
+
+    def _current_code_key(self) -> bytes:
+        version = self.editor.edit_version
+        # A set modified flag means <<Modified>> (and the version bump) is still queued
+        if (self._edit_hash is None or self._edit_hash[0] != version
+                or self.editor.text.edit_modified()):
+            self._edit_hash = (version, self._code_key(self.editor.get() or ""))
+        return self._edit_hash[1]
+
+    def _render_cache_key(self, code: str, diagram_theme: str, bg: str, width: int,
+                          header: str = "") -> str:
+        # Same digest as hashing header + code, without building the joined string
+        h = hashlib.blake2b(header.encode("utf-8"), digest_size=16)
+        h.update(code.encode("utf-8"))
+        h.update(f"|theme={diagram_theme}|b={bg}|w={width}|mmdc={self._mmdc_version_tag()}".encode("utf-8"))
+        return h.hexdigest()
+
+    def _mmdc_version_tag(self) -> str:
+        # A mermaid-cli upgrade can change the output, so it must not hit old cache entries
+        if self._mmdc_version is None:
+            version = ""
+            pkg_dir = self._mmdc_package_dir()
+            if pkg_dir is not None:
+                try:
+                    with open(pkg_dir / "package.json", "r", encoding="utf-8") as f:
+                        version = str(json.load(f).get("version", ""))
+                except Exception:
+                    pass
+            # Unknown layout: at least tell different installs apart
+            self._mmdc_version = version or str(self.mmdc_path)
+        return self._mmdc_version
 
-        self._render_async(input_file=temp_input_path, output_png=out_png)
+    def _show_cached_render(self, cached_png: Path, out_png: Path, target: tuple | None = None,
+                            source: tuple | None = None):
+        try:
+            # Mark as recently used for eviction
+            os.utime(cached_png)
+            if self.current_file:
+                shutil.copy(cached_png, out_png)
+            else:
+                out_png = cached_png
+        except Exception:
+            out_png = cached_png
+        self.last_png = out_png
+        self.last_rendered_hash = self._code_hash_being_rendered
+        self._last_render_target = target
+        self._last_render_source = source
+        self._last_render_ts = time.monotonic()
+        self.editor.clear_error_highlights()
+        self._errorlog_hide()
+        self.preview.display(out_png)
+        self._set_status(f"Rendered to {out_png.name} (cached)")
+
+    def _export_rendered_png(self, png_path: Path, dest: Path):
+        try:
+            shutil.copy(png_path, dest)
+            self._set_status(f"Exported PNG to {dest.name}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not export PNG:\n{e}")
+
+    def _store_cached_render(self, output_png: Path, cache_png: Path):
+        try:
+            _PNG_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            shutil.copy(output_png, cache_png)
+            # LRU eviction: drop the least recently used entries
+            entries = sorted(_PNG_CACHE_DIR.glob("*.png"), key=lambda p: p.stat().st_mtime)
+            for old in entries[:-_PNG_CACHE_MAX]:
+                old.unlink(missing_ok=True)
+        except Exception:
+            pass
 
     def _show_shortcuts_dialog(self):
         """Popup window listing common keyboard shortcuts."""
@@ -761,6 +1126,8 @@ class MermaidStudio(tk.Tk):
 
     def _open_mermaid_docs(self):
         """Open official Mermaid documentation in the user's default browser."""
+        import webbrowser  # only needed here
+
         url = "https://docs.mermaidchart.com/mermaid-oss/intro/index.html"
         try:
             webbrowser.open(url)
@@ -793,161 +1160,469 @@ class MermaidStudio(tk.Tk):
 
 
 
-    def _render_async(self, input_file: Path, output_png: Path):
-        if self.render_lock.locked():
-            messagebox.showinfo("Rendering", "A render is already in progress.")
-            return
+    def _render_async(self, code: str, output_png: Path, cache_png: Path | None = None,
+                      target: tuple | None = None, width: int = _EXPORT_WIDTH,
+                      header: str = ""):
+        # Snapshot everything Tk-side before leaving the main thread
+        bg_for_render = self.theme_manager.get_render_background()
+        diagram_theme = self.theme_manager.get_diagram_theme()
+        code_hash = self._code_hash_being_rendered
+        source = (code, header, diagram_theme, bg_for_render)
+        gen = self._render_gen
+        ui = self._post_ui
 
-        def worker():
-            with self.render_lock:
-                self._set_status("Rendering...")
+        def render():
+            ui(self._set_status, "Rendering...")
+            out_abs = output_png.resolve()
+            code_to_render = header + code if header else code
 
-                if not input_file.exists():
-                    self._set_status("Input file missing")
-                    messagebox.showerror("Render failed", f"Input file not found: {input_file}")
-                    return
+            # For error messages; _run_render builds its own
+            cmd = self._mmdc_cmd(out_abs, bg_for_render, diagram_theme, width)
 
-                # call mmdc (mermaid cli)
-                bg_for_render = self.theme_manager.get_render_background()
-                diagram_theme = self.theme_manager.get_diagram_theme()
-                
-                cmd = [
-                self.mmdc_path,
-                    "-i", str(input_file.resolve()),
-                    "-o", str(output_png.resolve()),
-                    "-b", bg_for_render,
-                    "-w", "2048",
-                    "--theme", diagram_theme,
-                ]   
-
-                config_path = Path.home() / ".config" / "mermaid_studio" / "puppeteer.json"
-                if config_path.exists():
-                    cmd += ["-p", str(config_path)]
+            try:
+                result = self._run_render(code_to_render, out_abs, bg_for_render, diagram_theme, width)
 
-                try:
-                    # Run in the input file directory. Add a timeout so we do not hang forever.
-                    result = subprocess.run(
-                        cmd,
-                        capture_output=True,
-                        text=True,
-                        check=False,
-                        cwd=str(input_file.parent),
-                        timeout=45,
-                    )
-
-                    soft_error = False
-                    error_markers = [
-                        "Syntax error in text",
-                        "Parse error on line",
-                        "Lexical error on line",
-                        "Expecting '",         # mermaid's "Expecting 'X' got 'Y'" style
-                    ]
-                    combined_output = (result.stderr or "") + "\n" + (result.stdout or "")
-                    for marker in error_markers:
-                        if marker in combined_output:
-                            soft_error = True
-                            break
-
-                    if result.returncode != 0 or soft_error:
-                        items, summary, full_text = self._parse_mermaid_errors(result.stderr, result.stdout)
-                        # Show in status bar
-                        self._set_status(f"Render failed: {summary[:160]}")
-                        # Highlite all errored lines
-                        if items:
-                            try:
-                                self.editor.highlight_errors(items)
-                            except Exception:
-                                pass
-                        self._errorlog_show(full_text)
-                        return
-                    if not output_png.exists():
-                        raise RuntimeError("mmdc finished but no output PNG was produced")
-                except subprocess.TimeoutExpired as te:
-                    self._set_status("Render timed out")
-                    messagebox.showerror(
-                        "Render failed",
-                        f"mmdc timed out after {te.timeout}s. \n \nCommand:\n{' '.join(cmd)}"
-                    )
+                if self._render_cancelled:
+                    ui(self._set_status, "Render cancelled")
                     return
-                except FileNotFoundError:
-                    self._set_status("mmdc not found")
-                    messagebox.showerror("Error", "mmdc not found. Set the path in Settings.")
+
+                soft_error = bool(
+                    _ERR_MARKER_RE.search(result.stderr or "")
+                    or _ERR_MARKER_RE.search(result.stdout or "")
+                )
+
+                if gen != self._render_gen:
+                    # Superseded while running; only keep a good PNG for the cache
+                    if result.returncode == 0 and not soft_error and cache_png is not None:
+                        self._store_cached_render(output_png, cache_png)
                     return
-                except Exception as e:
-                    self._set_status("Render failed")
-                    messagebox.showerror(
-                        "Render failed",
-                        f"{e}\n \nCommand:\n{' '.join(cmd)}\n \nInput:\n{input_file}\nOutput:\n{output_png}"
-                    )
+                if result.returncode != 0 or soft_error:
+                    items, summary, full_text = self._parse_mermaid_errors(result.stderr, result.stdout)
+                    ui(self._show_render_errors, items, summary, full_text)
                     return
+                if not output_png.exists():
+                    raise RuntimeError("mmdc finished but no output PNG was produced")
+            except subprocess.TimeoutExpired as te:
+                ui(self._set_status, "Render timed out")
+                ui(
+                    messagebox.showerror,
+                    "Render failed",
+                    f"mmdc timed out after {te.timeout}s. \n \nCommand:\n{' '.join(cmd)}"
+                )
+                return
+            except FileNotFoundError:
+                ui(self._set_status, "mmdc not found")
+                ui(messagebox.showerror, "Error", "mmdc not found. Set the path in Settings.")
+                return
+            except Exception as e:
+                ui(self._set_status, "Render failed")
+                ui(
+                    messagebox.showerror,
+                    "Render failed",
+                    f"{e}\n \nCommand:\n{' '.join(cmd)}\n \nOutput:\n{output_png}"
+                )
+                return
 
 
-                # Clean temp input file if it was created by us
-                try:
-                    if str(input_file.name).startswith("mstudio_"):
-                        input_file.unlink(missing_ok=True)
-                except Exception:
-                    pass
-                self.last_png = output_png
-                self.last_rendered_hash = self._code_hash_being_rendered
-                self._set_status(f"Rendered to {output_png.name}")
-                self.editor.clear_error_highlights()
-                self._errorlog_hide()
-                # Update preview
-                try:
-                    # If using PreviewPane
-                    if hasattr(self, "preview"):
-                        self.preview.display(output_png)
-                    else:
-                        self._show_preview(output_png)
-                except Exception:
-                    # Fall back to old method if needed
-                    self._show_preview(output_png)
+            if cache_png is not None:
+                self._store_cached_render(output_png, cache_png)
+            # Decode and scale here, off the Tk thread; only the PhotoImage is built on it
+            try:
+                prepared = self.preview.prepare(output_png)
+            except Exception:
+                prepared = None
+            # Render state is only written on the Tk thread, where gen is checked again
+            ui(self._show_rendered_png, output_png, prepared, gen, code_hash, target, source)
+
+        with self._render_cond:
+            # Newest wins: a job still waiting is stale now
+            self._pending_render[:] = [render]
+            self._render_cond.notify()
+        self.cancel_btn.configure(state="normal")
+        if not self._ui_draining:
+            self._drain_ui()
+
+    def _export_async(self, dest: Path):
+        """
+        Render the diagram behind the current preview at full width into dest.
+        Export jobs have their own queue: later edits and renders never drop them.
+        """
+        code, header, diagram_theme, bg_for_render = self._last_render_source
+        key = self._render_cache_key(code, diagram_theme, bg_for_render, _EXPORT_WIDTH, header=header)
+        cache_png = _PNG_CACHE_DIR / f"{key}.png"
+        if cache_png.exists():
+            self._export_rendered_png(cache_png, dest)
+            return
+        ui = self._post_ui
+
+        def export():
+            ui(self._set_status, "Rendering for export...")
+            out_abs = dest.resolve()
+            try:
+                result = self._run_render(header + code, out_abs, bg_for_render, diagram_theme, _EXPORT_WIDTH)
+                if self._render_cancelled:
+                    ui(self._set_status, "Export cancelled")
+                    return
+                if (result.returncode != 0 or not out_abs.exists()
+                        or _ERR_MARKER_RE.search(result.stderr or "")
+                        or _ERR_MARKER_RE.search(result.stdout or "")):
+                    _items, summary, _full = self._parse_mermaid_errors(result.stderr, result.stdout)
+                    raise RuntimeError(summary or "mmdc produced no PNG")
+            except Exception as e:
+                ui(self._set_status, "Export failed")
+                ui(messagebox.showerror, "Export failed", f"Could not render {dest.name}:\n{e}")
+                return
+            self._store_cached_render(out_abs, cache_png)
+            ui(self._set_status, f"Exported PNG to {dest.name}")
+
+        with self._render_cond:
+            self._export_jobs.append(export)
+            self._render_cond.notify()
+        self.cancel_btn.configure(state="normal")
+        if not self._ui_draining:
+            self._drain_ui()
+
+    def _mmdc_cmd(self, out_abs: Path, bg: str, diagram_theme: str, width: int) -> list[str]:
+        # call mmdc (mermaid cli), source piped in on stdin
+        cmd = [
+            self.mmdc_path,
+            "-i", "-",
+            "-o", str(out_abs),
+            "-b", bg,
+            "-w", str(width),
+            "--theme", diagram_theme,
+        ]
+        if _PUPPETEER_CONFIG.exists():
+            cmd += ["-p", str(_PUPPETEER_CONFIG)]
+        return cmd
+
+    def _run_render(self, code: str, out_abs: Path, bg: str, diagram_theme: str,
+                    width: int) -> subprocess.CompletedProcess:
+        """Render on the worker thread: persistent helper if available, else one-shot mmdc."""
+        result = self._render_via_server(code, out_abs, bg, diagram_theme, width)
+        if result is not None:
+            return result
+        # No persistent renderer available: one-shot mmdc.
+        # Run in the output directory. Add a timeout so we do not hang forever.
+        cmd = self._mmdc_cmd(out_abs, bg, diagram_theme, width)
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            cwd=str(out_abs.parent),
+        )
+        # Kept so Cancel can kill it
+        self._render_proc = proc
+        try:
+            stdout, stderr = proc.communicate(code, timeout=_RENDER_TIMEOUT_S)
+        except subprocess.TimeoutExpired:
+            proc.terminate()
+            try:
+                proc.communicate(timeout=_TERMINATE_GRACE_S)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+            raise
+        finally:
+            self._render_proc = None
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+    def _render_worker(self):
+        while True:
+            with self._render_cond:
+                while not self._export_jobs and not self._pending_render and not self._prewarm:
+                    self._render_cond.wait()
+                if self._export_jobs:
+                    job = self._export_jobs.pop(0)
+                    self._render_busy = True
+                    self._render_cancelled = False
+                elif not self._pending_render:
+                    # Idle: one example prewarm, then check for user renders again
+                    prewarm = self._prewarm.pop()
+                    job = None
+                else:
+                    job = self._pending_render.pop()
+                    self._render_busy = True
+                    self._render_cancelled = False
+            if job is None:
+                self._prewarm_one(*prewarm)
+                continue
+            try:
+                job()
+            except Exception:
+                pass
+            finally:
+                self._last_render_ts = time.monotonic()
+                # Queued before clearing busy so _drain_ui keeps polling until it runs
+                self._post_ui(self._render_finished)
+                with self._render_cond:
+                    self._render_busy = False
+                    self._render_cancelled = False
+
+    def _prewarm_one(self, code: str, cache_png: Path, bg: str, diagram_theme: str, width: int):
+        if cache_png.exists():
+            return
+        tmp_png = _CACHE_DIR / "mstudio_prewarm.png"
+        try:
+            _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            result = self._render_via_server(code, tmp_png.resolve(), bg, diagram_theme, width)
+            if result is None:
+                # No helper: not worth a one-shot mmdc per example
+                with self._render_cond:
+                    self._prewarm.clear()
+                return
+            if (result.returncode == 0 and tmp_png.exists()
+                    and not _ERR_MARKER_RE.search(result.stderr or "")):
+                self._store_cached_render(tmp_png, cache_png)
+        except Exception:
+            pass
+        finally:
+            try:
+                tmp_png.unlink(missing_ok=True)
+            except Exception:
+                pass
 
-                # If edits happened during render and auto render is still on, schedule a quick follow-up
-                if self.pending_autorender and self.auto_render_var.get():
-                    self.pending_autorender = False
-                    self._schedule_autorender(delay_ms=1000)
+    def _post_ui(self, func, *args):
+        """Queue a UI call from a worker thread; it runs on the Tk main thread."""
+        self._ui_queue.put((func, args))
 
+    def _drain_ui(self):
+        while True:
+            try:
+                func, args = self._ui_queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                func(*args)
+            except Exception:
+                pass
+        # Keep polling while a render is running
+        if self._render_active() or not self._ui_queue.empty():
+            self._ui_draining = True
+            self.after(30, self._drain_ui)
+        else:
+            self._ui_draining = False
 
+    def _render_finished(self):
+        if not self._pending_render and not self._export_jobs:
+            self.cancel_btn.configure(state="disabled")
 
-        threading.Thread(target=worker, daemon=True).start()
+    def _show_render_errors(self, items, summary: str, full_text: str):
+        # Show in status bar
+        self._set_status(f"Render failed: {summary[:160]}")
+        # Highlite all errored lines
+        if items:
+            try:
+                self.editor.highlight_errors(items)
+            except Exception:
+                pass
+        self._errorlog_show(full_text)
 
-    # - Helpers
-    def _show_preview(self, png_path: Path):
+    def _show_rendered_png(self, png_path: Path, prepared, gen: int, code_hash,
+                           target: tuple | None, source: tuple):
+        if gen != self._render_gen:
+            # Superseded after the worker's check; a newer render owns the state
+            return
+        self.last_png = png_path
+        self.last_rendered_hash = code_hash
+        self._last_render_target = target
+        self._last_render_source = source
+        self._set_status(f"Rendered to {png_path.name}")
+        self.editor.clear_error_highlights()
+        self._errorlog_hide()
         try:
-            img = Image.open(png_path)
+            self.preview.display(png_path, prepared)
         except Exception as e:
             messagebox.showerror("Preview error", f"Could not open PNG:\n{e}")
+
+    # - Persistent renderer
+    def _mmdc_package_dir(self) -> Path | None:
+        # mmdc is normally a symlink to <mermaid-cli>/src/cli.js
+        try:
+            cli = Path(self.mmdc_path).resolve()
+        except Exception:
+            return None
+        if cli.parent.name == "src" and (cli.parent / "index.js").exists():
+            return cli.parent.parent
+        return None
+
+    def _ensure_mmdc_server(self) -> subprocess.Popen | None:
+        with self._mmdc_lock:
+            return self._start_mmdc_server_locked()
+
+    def _start_mmdc_server_locked(self) -> subprocess.Popen | None:
+        proc = self._mmdc_proc
+        if proc is not None and proc.poll() is None:
+            return proc
+        self._mmdc_proc = None
+
+        node = shutil.which("node")
+        pkg_dir = self._mmdc_package_dir()
+        if self._mmdc_server_failed or not node or pkg_dir is None or not _MMDC_SERVER_SCRIPT.exists():
+            return None
+
+        cmd = [node, str(_MMDC_SERVER_SCRIPT), str(pkg_dir)]
+        if _PUPPETEER_CONFIG.exists():
+            cmd.append(str(_PUPPETEER_CONFIG))
+        try:
+            self._mmdc_proc = subprocess.Popen(
+                cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding="utf-8",
+                bufsize=1,
+            )
+        except Exception:
+            return None
+        return self._mmdc_proc
+
+    def _render_via_server(self, code: str, output_png: Path, bg: str, diagram_theme: str, width: int):
+        """
+        Render through the persistent Node helper.
+        output_png must be absolute: the helper does not share our cwd.
+        Returns a CompletedProcess shaped like the mmdc run, or None if the
+        helper is unavailable and the caller should fall back to mmdc.
+        """
+        proc = self._ensure_mmdc_server()
+        if proc is None:
+            return None
+
+        self._mmdc_req_id += 1
+        request = {
+            "id": self._mmdc_req_id,
+            "code": code,
+            "output": str(output_png),
+            "backgroundColor": bg,
+            "theme": diagram_theme,
+            "width": width,
+        }
+
+        timed_out = []
+
+        def on_timeout():
+            timed_out.append(True)
+            self._terminate_proc(proc)
+
+        timer = threading.Timer(_RENDER_TIMEOUT_S, on_timeout)
+        timer.start()
+        try:
+            proc.stdin.write(json.dumps(request) + "\n")
+            proc.stdin.flush()
+            line = proc.stdout.readline()
+        except Exception:
+            line = ""
+        finally:
+            timer.cancel()
+
+        if timed_out:
+            self._forget_mmdc_server(proc)
+            raise subprocess.TimeoutExpired(proc.args, _RENDER_TIMEOUT_S)
+        if self._render_cancelled:
+            # Killed from the UI; the next render starts a fresh helper
+            self._forget_mmdc_server(proc)
+            return subprocess.CompletedProcess(proc.args, -9, stdout="", stderr="")
+        try:
+            reply = json.loads(line)
+        except Exception:
+            if not self._forget_mmdc_server(proc):
+                # Stopped on purpose (Rescan, new mmdc path): not a helper failure,
+                # just finish this render with one-shot mmdc
+                return None
+            # Helper died (e.g. could not load puppeteer): use mmdc from now on
+            self._terminate_proc(proc)
+            self._mmdc_server_failed = True
+            return None
+
+        ok = bool(reply.get("ok"))
+        return subprocess.CompletedProcess(
+            proc.args, 0 if ok else 1, stdout="", stderr="" if ok else str(reply.get("error", ""))
+        )
+
+    def _forget_mmdc_server(self, proc: subprocess.Popen) -> bool:
+        """Drop proc as the current helper; False if it was already stopped or replaced."""
+        with self._mmdc_lock:
+            if self._mmdc_proc is not proc:
+                return False
+            self._mmdc_proc = None
+            return True
+
+    def _stop_mmdc_server(self):
+        with self._mmdc_lock:
+            proc, self._mmdc_proc = self._mmdc_proc, None
+        if proc is None:
             return
-        
-        # Remove placeholder text once something is rendered
-        #if hasattr(self, "placeholder_text"):
-        #    self.canvas.delete(self.placeholder_text)
-
-        # Fit image to canvas while preserving aspect ratio
-        canvas_w = self.canvas.winfo_width() or 600
-        canvas_h = self.canvas.winfo_height() or 400
-        img_ratio = img.width / img.height
-        canvas_ratio = canvas_w / canvas_h
-
-        if img_ratio > canvas_ratio:
-            new_w = min(img.width, canvas_w)
-            new_h = int(new_w / img_ratio)
-        else:
-            new_h = min(img.height, canvas_h)
-            new_w = int(new_h * img_ratio)
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=_TERMINATE_GRACE_S)
+        except Exception:
+            self._terminate_proc(proc)
 
-        preview = img.resize((max(1, new_w), max(1, new_h)), Image.LANCZOS)
-        self.preview_img = ImageTk.PhotoImage(preview)  # keep reference
-        self.canvas.delete("all")
-        self.canvas.create_image(canvas_w // 2, canvas_h // 2, image=self.preview_img, anchor="center")
-        self.canvas.update_idletasks()
+    def _terminate_proc(self, proc: subprocess.Popen):
+        """SIGTERM now, SIGKILL after a grace period; never blocks the caller."""
+        def kill_if_alive():
+            if proc.poll() is None:
+                try:
+                    proc.kill()
+                except Exception:
+                    pass
+
+        try:
+            proc.terminate()
+        except Exception:
+            pass
+        timer = threading.Timer(_TERMINATE_GRACE_S, kill_if_alive)
+        timer.daemon = True
+        timer.start()
 
+    # - Helpers
     def _find_mmdc(self):
         # Find mmdc in PATH
         return shutil.which("mmdc")
 
+    def _load_tool_paths(self):
+        """Reuse last run's chrome/mmdc paths if they still exist, else discover them."""
+        try:
+            with open(_TOOL_PATHS_FILE, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            chrome = data.get("chrome_path")
+            mmdc = data.get("mmdc_path")
+            fresh = time.time() - float(data.get("verified_at", 0)) < _TOOL_PATHS_MAX_AGE_S
+            if (fresh and mmdc and os.access(mmdc, os.X_OK)
+                    and (chrome is None or os.path.exists(chrome))):
+                self.chrome_path, self.mmdc_path = chrome, mmdc
+                return
+        except Exception:
+            pass
+        self._rescan_tool_paths()
+
+    def _rescan_tool_paths(self):
+        self.chrome_path = self._find_chrome()
+        self.mmdc_path = self._find_mmdc()
+        self._save_tool_paths()
+
+    def _save_tool_paths(self):
+        try:
+            _TOOL_PATHS_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(_TOOL_PATHS_FILE, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"chrome_path": self.chrome_path, "mmdc_path": self.mmdc_path, "verified_at": time.time()},
+                    f, indent=2,
+                )
+        except Exception:
+            pass
+
+    def _rescan_tools_clicked(self):
+        self._rescan_tool_paths()
+        self._stop_mmdc_server()
+        self._mmdc_server_failed = False
+        self._mmdc_version = None
+        self._set_status(f"mmdc: {self.mmdc_path or 'not found'}")
+
     def _prompt_set_mmdc_path(self):
         if messagebox.askyesno("mmdc not found", "mermaid-cli (mmdc) was not found in PATH. Do you want to locate it?"):
             self._set_mmdc_path()
@@ -962,6 +1637,11 @@ class MermaidStudio(tk.Tk):
             messagebox.showerror("Invalid", "Selected file is not executable.")
             return
         self.mmdc_path = path
+        self._save_tool_paths()
+        # Restart the render helper against the new install
+        self._stop_mmdc_server()
+        self._mmdc_server_failed = False
+        self._mmdc_version = None
         self.status.configure(text=f"mmdc set to: {path}")
 
     def _set_title(self):
@@ -980,33 +1660,22 @@ class MermaidStudio(tk.Tk):
         We look for multiple '... error on line N ...' patterns and optional 'column C'.
         """
         full = ((stderr or "") + "\n" + (stdout or "")).strip()
-        # Collect all line numbers
-        lines = []
-        for m in re.finditer(r"(?:Parse|Lexical)\s+error.*?line\s+(\d+)", full, re.IGNORECASE | re.DOTALL):
-            try:
-                lines.append(int(m.group(1)))
-            except Exception:
-                pass
-        # Fallback: any 'line <num>' mentions
-        if not lines:
-            for m in re.finditer(r"\bline\s+(\d+)\b", full, re.IGNORECASE):
-                try:
-                    lines.append(int(m.group(1)))
-                except Exception:
-                    pass
-        col = None
-        mc = re.search(r"\bcolumn\s+(\d+)\b", full, re.IGNORECASE)
-        if mc:
-            try:
-                col = int(mc.group(1))
-            except Exception:
-                pass
-
-        uniq = sorted(set(lines))
-        items = [(ln, col) for ln in uniq] if uniq else []
-
-        lines_nonempty = [ln.strip() for ln in full.splitlines() if ln.strip()]
-        summary = " | ".join(lines_nonempty[:3]) if lines_nonempty else "Mermaid render error"
+        err_lines, other_lines, col = set(), set(), None
+        for m in _ERR_POS_RE.finditer(full):
+            if m.group("err_line"):
+                err_lines.add(int(m.group("err_line")))
+            elif m.group("line"):
+                other_lines.add(int(m.group("line")))
+            elif col is None:
+                col = int(m.group("col"))
+
+        # Parse/lexical error lines win; otherwise any 'line <num>' mention
+        uniq = sorted(err_lines or other_lines)
+        items = [(ln, col) for ln in uniq]
+
+        # First three non-blank lines, without splitting the whole text
+        head = [m.group().strip() for _, m in zip(range(3), _NONBLANK_LINE_RE.finditer(full))]
+        summary = " | ".join(head) if head else "Mermaid render error"
 
         return items, summary, (full or "No error text")
     
@@ -1016,19 +1685,9 @@ class MermaidStudio(tk.Tk):
         We skip blank lines and Mermaid comments (%% ...).
         Returns lowercase keyword like 'flowchart', 'sequenceDiagram' -> 'sequencediagram', etc.
         """
-        for raw_line in code.splitlines():
-            line = raw_line.strip()
-            if not line:
-                continue
-            if line.startswith("%%"):
-                continue
-
-            # first token on the line (letters, digits, dash, underscore, dot)
-            m = re.match(r"^([A-Za-z0-9_.:-]+)", line)
-            if m:
-                return m.group(1).lower()
-
-        return None
+        # Stops at the first hit instead of splitting the whole buffer into lines
+        m = _DIAGRAM_TYPE_RE.search(code)
+        return m.group(1).lower() if m else None
 
 
     def _maybe_warn_diagram_type(self, code: str):
@@ -1038,48 +1697,6 @@ class MermaidStudio(tk.Tk):
         error log panel (non-fatal) BEFORE we actually render.
         """
 
-        # This is our "known good / common" set for current CLI versions.
-        # NOTE: All are stored lowercase.
-        STABLE_TYPES = {
-            "flowchart", "flowchart-lr", "flowchart-rl", "flowchart-tb", "flowchart-bt",
-            "graph",
-            "sequencediagram",
-            "classdiagram",
-            "statediagram", "statediagram-v2",
-            "erdigram", "erdiagram",
-            "journey",
-            "gantt",
-            "pie",
-            "quadrantchart",
-            "requirementdiagram",
-            "gitgraph", "gitgraph",  # both spellings collapse to 'gitgraph' anyway after .lower()
-            "c4context", "c4container", "c4component", "c4dynamic",
-            "mindmap",
-            "timeline",
-            "sankey", "sankey-beta",
-            "xychart", "xychart-beta",
-            "blockdiagram",
-            "packet",
-            "kanban",
-            "architecture",    # <-- newer/experimental in some Mermaid builds
-            "radar",
-            "treemap",
-        }
-
-        # Things that exist in Mermaid spec/docs but are still considered
-        # experimental / version-sensitive. We'll gently warn on these.
-        POTENTIALLY_UNSTABLE = {
-            "architecture", "architecture-beta",
-            "c4context", "c4container", "c4component", "c4dynamic",
-            "quadrantchart",
-            "sankey", "sankey-beta",
-            "xychart", "xychart-beta",
-            "kanban",
-            "radar",
-            "treemap", "treemap-beta"
-            "blockdiagram",
-        }
-
         dtype = self._detect_diagram_type(code)
         if dtype is None:
             # nothing meaningful found, don't warn
@@ -1088,8 +1705,8 @@ class MermaidStudio(tk.Tk):
         # Normalize some aliases so 'sequenceDiagram' becomes 'sequencediagram'
         # 'erDiagram' -> 'erdiagram', etc.
 
-        is_known = dtype in STABLE_TYPES
-        is_unstable = dtype in POTENTIALLY_UNSTABLE
+        is_known = dtype in _STABLE_TYPES
+        is_unstable = dtype in _POTENTIALLY_UNSTABLE
 
         # Three situations to warn the user:
         # 1. We don't even recognize this type at all.
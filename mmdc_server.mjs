@@ -0,0 +1,96 @@
+// mmdc_server.mjs
+// Long-lived render helper for Mermaid Studio.
+// Keeps one headless browser open and renders diagrams through
+// mermaid-cli's renderMermaid(), so Node/Chromium start up only once.
+//
+// Usage: node mmdc_server.mjs <mermaid-cli package dir> [puppeteer.json]
+//
+// Protocol (newline-delimited JSON):
+//   in:  {"id": 1, "code": "...", "output": "/path/out.png",
+//         "backgroundColor": "white", "theme": "default", "width": 2048}
+//   out: {"id": 1, "ok": true} or {"id": 1, "ok": false, "error": "..."}
+
+import { createRequire } from "node:module";
+import { readFile, writeFile } from "node:fs/promises";
+import path from "node:path";
+import readline from "node:readline";
+import { pathToFileURL } from "node:url";
+
+const [pkgDir, puppeteerConfigPath] = process.argv.slice(2);
+if (!pkgDir) {
+  process.stderr.write("usage: node mmdc_server.mjs <mermaid-cli dir> [puppeteer.json]\n");
+  process.exit(2);
+}
+
+// Resolve puppeteer and mermaid-cli from the mmdc install, not from here
+const require = createRequire(path.join(pkgDir, "package.json"));
+const puppeteer = require("puppeteer");
+const { renderMermaid } = await import(pathToFileURL(path.join(pkgDir, "src", "index.js")).href);
+
+let puppeteerConfig = {};
+if (puppeteerConfigPath) {
+  puppeteerConfig = JSON.parse(await readFile(puppeteerConfigPath, "utf8"));
+}
+
+let browserPromise = null;
+
+function getBrowser() {
+  if (!browserPromise) {
+    browserPromise = puppeteer.launch({ headless: "shell", ...puppeteerConfig }).then((browser) => {
+      browser.on("disconnected", () => { browserPromise = null; });
+      return browser;
+    });
+    browserPromise.catch(() => { browserPromise = null; });
+  }
+  return browserPromise;
+}
+
+// Launch the browser right away so the first render does not wait for it
+getBrowser().catch(() => {});
+
+// Close the browser on every way out, or puppeteer leaves Chromium running.
+// The app cancels or times out a render with SIGTERM; stdin closing means it is gone.
+let shuttingDown = false;
+async function shutdown(code) {
+  if (shuttingDown) return;
+  shuttingDown = true;
+  if (browserPromise) {
+    const browser = await browserPromise.catch(() => null);
+    if (browser) await browser.close().catch(() => {});
+  }
+  process.exit(code);
+}
+
+process.on("SIGTERM", () => shutdown(143));
+process.on("SIGINT", () => shutdown(130));
+// Also fires mid-render, when the request loop below is not reading
+process.stdin.on("close", () => shutdown(0));
+
+async function render(req) {
+  const { data } = await renderMermaid(await getBrowser(), req.code, "png", {
+    viewport: { width: req.width || 800, height: 600, deviceScaleFactor: 1 },
+    backgroundColor: req.backgroundColor || "white",
+    mermaidConfig: { theme: req.theme || "default" },
+  });
+  await writeFile(req.output, data);
+}
+
+function reply(obj) {
+  process.stdout.write(JSON.stringify(obj) + "\n");
+}
+
+// One request at a time: the app only ever has a single render in flight
+const rl = readline.createInterface({ input: process.stdin, crlfDelay: Infinity });
+for await (const line of rl) {
+  if (!line.trim()) continue;
+  let req;
+  try {
+    req = JSON.parse(line);
+    await render(req);
+    reply({ id: req.id, ok: true });
+  } catch (err) {
+    reply({ id: req ? req.id : null, ok: false, error: String((err && err.message) || err) });
+  }
+}
+
+await shutdown(0);
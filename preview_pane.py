@@ -3,11 +3,63 @@
 # Dependencies: Pillow (PIL)
 
 from __future__ import annotations
+import base64
+import io
+import struct
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, NamedTuple, Optional
 import tkinter as tk
 from tkinter import ttk
-from PIL import Image, ImageTk
+
+# Pillow is imported on first display() so it stays off the startup path
+if TYPE_CHECKING:
+    from PIL import Image, ImageTk
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Scaled PhotoImages kept per displayed image, keyed by scaled size
+_PHOTO_CACHE_MAX = 4
+_PHOTO_CACHE_MAX_PIXELS = 4_000_000
+# Rescale only once a window drag has paused this long
+_RESIZE_SETTLE_MS = 80
+
+
+def _image_size(data: bytes) -> tuple[int, int]:
+    # PNG width/height live in the IHDR chunk right after the signature
+    if data[:8] == _PNG_SIGNATURE and data[12:16] == b"IHDR":
+        return struct.unpack(">II", data[16:24])
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        return img.size
+
+
+def _open_rgba(data: bytes) -> Image.Image:
+    from PIL import Image
+
+    return Image.open(io.BytesIO(data)).convert("RGBA")
+
+
+def _resized(src: Image.Image, size: tuple[int, int]) -> Image.Image:
+    from PIL import Image
+
+    # BILINEAR is about twice as fast as LANCZOS and fine for an on-screen preview;
+    # exports copy the rendered PNG untouched
+    sw, sh = size
+    factor = min(src.width // sw, src.height // sh)
+    if factor >= 2:
+        # Integer box-reduce first (cheap), then filter the small remainder
+        src = src.reduce(factor)
+    return src.resize(size, Image.BILINEAR)
+
+
+class PreparedImage(NamedTuple):
+    """Result of PreviewPane.prepare(): decoded and fit-scaled pixels, no Tk objects."""
+    path: Path
+    data: bytes
+    size: tuple[int, int]
+    source: Optional[Image.Image]
+    scaled_size: tuple[int, int]
+    scaled: Optional[Image.Image]
 
 
 class PreviewPane(tk.Frame):
@@ -15,9 +67,11 @@ class PreviewPane(tk.Frame):
     Drop-in preview widget.
 
     Public API:
-      - display(image_path: str | Path) -> None
+      - prepare(image_path: str | Path) -> PreparedImage   # thread-safe, no Tk calls
+      - display(image_path: str | Path, prepared: PreparedImage | None = None) -> None
       - set_placeholder(text: str = "No preview rendered yet") -> None
       - reset_view() -> None
+      - canvas_size() -> tuple[int, int]                   # as of the last <Configure>
       - canvas  (tk.Canvas)  - kept for compatibility if you accessed it directly
 
     Usage:
@@ -45,9 +99,15 @@ class PreviewPane(tk.Frame):
         self.btn_reset.lower(self.canvas)
 
         # Internal state
-        self._src_image: Optional[Image.Image] = None   # original PIL image
-        self._photo: Optional[ImageTk.PhotoImage] = None
-        self._img_item: Optional[int] = None
+        self._src_data: Optional[bytes] = None   # encoded file contents, read once per display()
+        self._src_size: Optional[tuple[int, int]] = None
+        self._src_image: Optional[Image.Image] = None   # original PIL image, decoded on demand
+        self._photo: Optional[tk.PhotoImage | ImageTk.PhotoImage] = None
+        self._photo_cache: dict[tuple[int, int], tk.PhotoImage | ImageTk.PhotoImage] = {}
+        self._last_canvas_size: Optional[tuple[int, int]] = None
+        self._resize_job: Optional[str] = None
+        # One image item, reused for every render
+        self._img_item: int = self.canvas.create_image(0, 0, anchor="center", state="hidden")
         self._zoom: float = 1.0
         self._fit_zoom: float = 1.0
         self._min_zoom: float = 0.05
@@ -55,9 +115,14 @@ class PreviewPane(tk.Frame):
 
         # Panning
         self._pan_start: Optional[tuple[int, int]] = None
+        self._resize_pending = False   # canvas resized mid-drag; refit on release
 
-        # Placeholder
-        self._placeholder_id: Optional[int] = None
+        # Placeholder: one canvas item, shown/hidden as needed
+        self._placeholder_id: int = self.canvas.create_text(
+            200, 120,
+            font=("Segoe UI", 14, "italic"),
+            anchor="center",
+        )
         self.set_placeholder("No preview rendered yet")
 
         # Events
@@ -72,35 +137,85 @@ class PreviewPane(tk.Frame):
         # Pan with left button drag
         self.canvas.bind("<ButtonPress-1>", self._pan_start_evt, add=True)
         self.canvas.bind("<B1-Motion>", self._pan_move_evt, add=True)
+        self.canvas.bind("<ButtonRelease-1>", self._pan_end_evt, add=True)
 
     # Public API ---------------------------------------------------------------
 
-    def display(self, image_path: str | Path) -> None:
-        # (unchanged)
+    def prepare(self, image_path: str | Path) -> PreparedImage:
+        """
+        Decode and fit-scale an image ahead of display(), using the last known
+        canvas size. Makes no Tk calls, so it can run on a worker thread.
+        """
         path = Path(image_path)
-        self._src_image = Image.open(path).convert("RGBA")
+        # Read the file once; everything later decodes from this snapshot, since
+        # the path may be overwritten by the next render or evicted from the cache
+        data = path.read_bytes()
+        size = _image_size(data)
+        if self._last_canvas_size is None:
+            # Canvas not laid out yet: let display() do the work
+            return PreparedImage(path, data, size, None, size, None)
+        cw, ch = self._last_canvas_size
+        zoom = max(self._min_zoom, min(max(1, cw) / size[0], max(1, ch) / size[1]))
+        scaled_size = (max(1, int(size[0] * zoom)), max(1, int(size[1] * zoom)))
+        if scaled_size == size:
+            # Tk reads native-size PNGs itself
+            return PreparedImage(path, data, size, None, size, None)
+        src = _open_rgba(data)
+        return PreparedImage(path, data, size, src, scaled_size, _resized(src, scaled_size))
+
+    def canvas_size(self) -> tuple[int, int]:
+        """Canvas size as of the last <Configure>; queries Tk only before the first one."""
+        if self._last_canvas_size is None:
+            return (self.canvas.winfo_width(), self.canvas.winfo_height())
+        return self._last_canvas_size
+
+    def display(self, image_path: str | Path, prepared: Optional[PreparedImage] = None) -> None:
+        path = Path(image_path)
+        stale = [self._photo, *self._photo_cache.values()]
+        self._photo_cache.clear()
+        if prepared is not None and prepared.path == path:
+            self._src_data = prepared.data
+            self._src_size = prepared.size
+            self._src_image = prepared.source
+            if prepared.scaled is not None:
+                from PIL import ImageTk
+
+                self._photo_cache[prepared.scaled_size] = ImageTk.PhotoImage(prepared.scaled)
+        else:
+            # Snapshot the file now; pixels are decoded from it when first drawn
+            self._src_data = path.read_bytes()
+            self._src_size = _image_size(self._src_data)
+            self._src_image = None
         self._clear_placeholder()
         self._fit_to_window()
         self._render_image()
+        for photo in stale:
+            self._release_photo(photo)
         self.btn_reset.lift()
 
     def set_placeholder(self, text: str = "No preview rendered yet") -> None:
-        self.canvas.delete("all")
-        self._img_item = None
+        self.canvas.itemconfigure(self._img_item, image="", state="hidden")
+        self._src_size = None
+        self._src_data = None
+        self._src_image = None
+        stale = [self._photo, *self._photo_cache.values()]
         self._photo = None
-        self._placeholder_id = self.canvas.create_text(
-            self.canvas.winfo_width() // 2 or 200,
-            self.canvas.winfo_height() // 2 or 120,
+        self._photo_cache.clear()
+        for photo in stale:
+            self._release_photo(photo)
+        self.canvas.itemconfigure(
+            self._placeholder_id,
             text=text,
             fill=self.placeholder_fg,  # use current theme's placeholder fg
-            font=("Segoe UI", 14, "italic"),
-            anchor="center",
+            state="normal",
         )
+        cw, ch = self.canvas_size()
+        self.canvas.coords(self._placeholder_id, cw // 2 or 200, ch // 2 or 120)
         self.btn_reset.lower(self.canvas)
 
     def reset_view(self) -> None:
         """Reset zoom and center to fit."""
-        if self._src_image is None:
+        if self._src_size is None:
             return
         self._fit_to_window()
         self._render_image()
@@ -125,7 +240,7 @@ class PreviewPane(tk.Frame):
 
         # If we're currently showing the placeholder text (no image displayed),
         # redraw placeholder so it picks up the new placeholder_fg.
-        if self._src_image is None:
+        if self._src_size is None:
             self.set_placeholder("No preview rendered yet")
         else:
             # we do have an image, so just force a re-render to clear any highlight mismatch
@@ -134,21 +249,38 @@ class PreviewPane(tk.Frame):
     # Internal helpers ---------------------------------------------------------
 
     def _clear_placeholder(self):
-        if self._placeholder_id is not None:
-            self.canvas.delete(self._placeholder_id)
-            self._placeholder_id = None
+        self.canvas.itemconfigure(self._placeholder_id, state="hidden")
 
     def _on_resize(self, event=None):
-        # When the canvas resizes, recompute fit zoom and re-render if we are at fit
-        if self._src_image is None:
+        # Tk sends Configure for moves/restacks too; only act on a real size change
+        if event is not None:
+            size = (event.width, event.height)
+            if size == self._last_canvas_size:
+                return
+            self._last_canvas_size = size
+        cw, ch = self.canvas_size()
+        if self._src_size is None:
             # keep placeholder centered
-            if self._placeholder_id is not None:
-                self.canvas.coords(
-                    self._placeholder_id,
-                    self.canvas.winfo_width() // 2,
-                    self.canvas.winfo_height() // 2,
-                )
+            self.canvas.coords(self._placeholder_id, cw // 2, ch // 2)
+            return
+        if self._pan_start is not None:
+            # Mid-drag: leave the image under the pointer and refit on release
+            self._resize_pending = True
+            return
+        # Recentre now (cheap); the rescale waits until resizing settles
+        self.canvas.coords(self._img_item, cw // 2, ch // 2)
+        if self._resize_job is not None:
+            self.after_cancel(self._resize_job)
+        self._resize_job = self.after(_RESIZE_SETTLE_MS, self._apply_resize)
+
+    def _apply_resize(self):
+        self._resize_job = None
+        if self._src_size is None:
             return
+        if self._pan_start is not None:
+            self._resize_pending = True
+            return
+        # When the canvas resizes, recompute fit zoom and re-render if we are at fit
         prev_is_fit = abs(self._zoom - self._fit_zoom) < 1e-6
         self._fit_zoom = self._compute_fit_zoom()
         if prev_is_fit:
@@ -159,31 +291,66 @@ class PreviewPane(tk.Frame):
             self._render_image()
 
     def _compute_fit_zoom(self) -> float:
-        cw = max(1, self.canvas.winfo_width())
-        ch = max(1, self.canvas.winfo_height())
-        iw, ih = self._src_image.size
+        cw, ch = self.canvas_size()
+        cw, ch = max(1, cw), max(1, ch)
+        iw, ih = self._src_size
         return max(self._min_zoom, min(1.0 * cw / iw, 1.0 * ch / ih))
 
     def _fit_to_window(self):
         self._fit_zoom = self._compute_fit_zoom()
         self._zoom = self._fit_zoom
 
-    def _render_image(self):
+    def _source_image(self) -> Image.Image:
         if self._src_image is None:
+            self._src_image = _open_rgba(self._src_data)
+        return self._src_image
+
+    def _render_image(self):
+        if self._src_size is None:
             return
-        cw = max(1, self.canvas.winfo_width())
-        ch = max(1, self.canvas.winfo_height())
-        iw, ih = self._src_image.size
+        cw, ch = self.canvas_size()
+        cw, ch = max(1, cw), max(1, ch)
+        iw, ih = self._src_size
         sw = max(1, int(iw * self._zoom))
         sh = max(1, int(ih * self._zoom))
-        img = self._src_image.resize((sw, sh), Image.LANCZOS)
-        self._photo = ImageTk.PhotoImage(img)
-
-        self.canvas.delete("all")
-        self._img_item = self.canvas.create_image(cw // 2, ch // 2, image=self._photo, anchor="center")
+        photo = self._photo_cache.get((sw, sh))
+        evicted = None
+        if photo is None:
+            photo = self._make_photo(sw, sh)
+            if sw * sh <= _PHOTO_CACHE_MAX_PIXELS:
+                if len(self._photo_cache) >= _PHOTO_CACHE_MAX:
+                    evicted = self._photo_cache.pop(next(iter(self._photo_cache)))
+                self._photo_cache[(sw, sh)] = photo
+        previous, self._photo = self._photo, photo
+
+        # Swap the image on the existing item instead of delete + create (no flicker)
+        self.canvas.itemconfigure(self._img_item, image=self._photo, state="normal")
+        self._release_photo(previous)
+        self._release_photo(evicted)
+        self.canvas.coords(self._img_item, cw // 2, ch // 2)
         # Bring reset button to front
         self.btn_reset.lift()
 
+    def _make_photo(self, sw: int, sh: int):
+        if (sw, sh) == self._src_size:
+            # Native size: Tk decodes the PNG itself, no PIL decode/resample/re-encode
+            try:
+                return tk.PhotoImage(master=self.canvas, data=base64.b64encode(self._src_data))
+            except tk.TclError:
+                pass
+        from PIL import ImageTk
+
+        return ImageTk.PhotoImage(_resized(self._source_image(), (sw, sh)))
+
+    def _release_photo(self, photo) -> None:
+        # Delete the Tk image now rather than whenever the wrapper is collected
+        if photo is None or photo is self._photo or photo in self._photo_cache.values():
+            return
+        try:
+            self.canvas.tk.call("image", "delete", str(photo))
+        except tk.TclError:
+            pass
+
     # Zoom and pan -------------------------------------------------------------
 
     def _on_mousewheel_zoom(self, event):
@@ -194,7 +361,7 @@ class PreviewPane(tk.Frame):
             self._zoom_at(0.90, event.x, event.y)
 
     def _zoom_at(self, factor: float, x: int, y: int):
-        if self._src_image is None:
+        if self._src_size is None:
             return
 
         new_zoom = min(self._max_zoom, max(self._min_zoom, self._zoom * factor))
@@ -221,24 +388,31 @@ class PreviewPane(tk.Frame):
         self.canvas.move(self._img_item, target_cx - nx, target_cy - ny)
 
     def _get_image_center(self):
-        if self._img_item is None:
-            return (self.canvas.winfo_width() // 2, self.canvas.winfo_height() // 2)
+        if self._src_size is None:
+            cw, ch = self.canvas_size()
+            return (cw // 2, ch // 2)
         x, y = self.canvas.coords(self._img_item)
         return (int(x), int(y))
 
     def _pan_start_evt(self, event):
-        if self._img_item is None:
+        if self._src_size is None:
             return
         self._pan_start = (event.x, event.y)
 
     def _pan_move_evt(self, event):
-        if self._img_item is None or self._pan_start is None:
+        if self._src_size is None or self._pan_start is None:
             return
         sx, sy = self._pan_start
         dx, dy = event.x - sx, event.y - sy
         self.canvas.move(self._img_item, dx, dy)
         self._pan_start = (event.x, event.y)
 
+    def _pan_end_evt(self, event):
+        self._pan_start = None
+        if self._resize_pending:
+            self._resize_pending = False
+            self._apply_resize()
+
 
 # Manual test
 if __name__ == "__main__":
@@ -188,35 +188,17 @@ class ThemeManager:
         self.root.configure(bg=t["bg_main"])
 
         # ttk styles. Note: tkinter's themed widgets can be stubborn on some platforms,
-        # but we do best-effort.
-        self.ttk_style.configure(
-            "TFrame",
-            background=t["bg_panel"],
-        )
-        self.ttk_style.configure(
-            "TLabel",
-            background=t["toolbar_bg"],
-            foreground=t["toolbar_fg"],
-        )
-        self.ttk_style.configure(
-            "StatusLabel.TLabel",
-            background=t["toolbar_bg"],
-            foreground=t["status_fg"],
-        )
-        self.ttk_style.configure(
-            "TButton",
-            background=t["bg_panel"],
-            foreground=t["toolbar_fg"],
-        )
-        self.ttk_style.configure(
-            "TCheckbutton",
-            background=t["toolbar_bg"],
-            foreground=t["toolbar_fg"],
-        )
-        self.ttk_style.configure(
-            "TPanedwindow",
-            background=t["bg_main"],
+        # but we do best-effort. Tk folds these into one restyle pass at idle time.
+        styles = (
+            ("TFrame", {"background": t["bg_panel"]}),
+            ("TLabel", {"background": t["toolbar_bg"], "foreground": t["toolbar_fg"]}),
+            ("StatusLabel.TLabel", {"background": t["toolbar_bg"], "foreground": t["status_fg"]}),
+            ("TButton", {"background": t["bg_panel"], "foreground": t["toolbar_fg"]}),
+            ("TCheckbutton", {"background": t["toolbar_bg"], "foreground": t["toolbar_fg"]}),
+            ("TPanedwindow", {"background": t["bg_main"]}),
         )
+        for style_name, options in styles:
+            self.ttk_style.configure(style_name, **options)
 
         # Toolbar frame
         if self.toolbar is not None: